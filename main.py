@@ -1,63 +1,78 @@
 import sys
 import uvicorn
-import redis.asyncio as redis
 from pathlib import Path
 from fastapi import FastAPI, BackgroundTasks, Depends, APIRouter
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from pydantic import EmailStr
 from typing import List
-from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 
 import str.routes.auth as auth
 import str.routes.notes as notes
 import str.routes.users as users
+import str.routes.internal as internal
 from str.conf.config import settings
-from fastapi_limiter.depends import RateLimiter
+from str.database.db import dispose_engines, warm_up_engines
+from str.services import passwords
+from str.services.auth import auth_service
+from str.services.cache import close_redis, get_redis
+from str.services.compression import CompressionMiddleware
+from str.services.email import mailer
+from str.services.metrics import MetricsMiddleware
+from str.services.resources import Resources
+
+resources = Resources()
+resources.register("database", warm_up=warm_up_engines, close=dispose_engines)
+resources.register("redis", warm_up=lambda: get_redis().ping(), close=close_redis)
+resources.register("mail", warm_up=lambda: mailer.start(connect=True),
+                   close=lambda: mailer.stop(timeout=settings.mail_timeout))
+resources.register("passwords", warm_up=passwords.warm_up)
+resources.register("jwt", warm_up=auth_service.warm_up)
+resources.register("schemas", warm_up=lambda: app.openapi())
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    """Warm up the shared resources of the worker on startup and close them on shutdown.
+
+    Warm-up opens the database, Redis and SMTP connections, loads the password hashing
+    and JWT backends and builds the OpenAPI schema, so the first requests after a deploy
+    run as fast as the rest. A resource that cannot be warmed up is set up on first use.
+    Shutdown delivers the queued emails and closes every connection.
+    """
+    timings = await resources.start(warm_up=settings.warm_up)
+    if timings:
+        print("warm-up: " + ", ".join(f"{name} {'failed' if took is None else f'{took * 1000:.0f} ms'}"
+                                      for name, took in timings.items()))
+    yield
+    await resources.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
-dependencies = []
-if "pytest" not in sys.modules:
-    dependencies.append(
-        Depends(
-            RateLimiter(...)
-        )
-    )
 # api_router = APIRouter(prefix="/api", dependencies=dependencies)
 # add your routes to `api_router`
 # app.include_router(api_router)
 app.include_router(notes.router, prefix='/api')
 app.include_router(auth.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+app.include_router(internal.router, prefix='/api')
+app.include_router(internal.metrics_router)
+if settings.avatar_storage == 'local':
+    app.mount(settings.media_url, StaticFiles(directory=settings.media_root, check_dir=False), name="media")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
-
-# @app.on_event("startup")
-# async def startup():
-
-@asynccontextmanager
-async def lifespan(app):
-    """Initialize the Redis connection and FastAPI limiter on startup.
-
-    This function is executed during the startup event of the FastAPI application.
-    It initializes a Redis connection using the host and port settings from the
-    configuration, and then initializes the FastAPILimiter with this Redis instance.
-
-    Raises:
-        redis.ConnectionError: If the Redis server is unreachable.
-    """
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,30 @@
+"""add contacts user indexes
+
+Revision ID: 5b1f0c7d2a94
+Revises: 32bdc3fc1e64
+Create Date: 2024-07-20 18:42:11.305214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c7d2a94'
+down_revision: Union[str, None] = '32bdc3fc1e64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_last_name_first_name', 'contacts', ['user_id', 'last_name', 'first_name'], unique=False)
+    op.create_index('ix_contacts_user_id_email', 'contacts', ['user_id', 'email'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_email', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_last_name_first_name', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
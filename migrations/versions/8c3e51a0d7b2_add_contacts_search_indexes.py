@@ -0,0 +1,56 @@
+"""add contacts search indexes
+
+Revision ID: 8c3e51a0d7b2
+Revises: 5b1f0c7d2a94
+Create Date: 2024-07-21 12:06:47.918530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3e51a0d7b2'
+down_revision: Union[str, None] = '5b1f0c7d2a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE contacts_fts USING fts5("
+                   "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')")
+        op.execute("CREATE TRIGGER contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+                   "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+                   "VALUES (new.id, new.first_name, new.last_name, new.email); END")
+        op.execute("CREATE TRIGGER contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+                   "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+                   "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END")
+        op.execute("CREATE TRIGGER contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+                   "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+                   "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+                   "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+                   "VALUES (new.id, new.first_name, new.last_name, new.email); END")
+        op.execute("INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')")
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_contacts_first_name_trgm', 'contacts', ['first_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'first_name': 'gin_trgm_ops'})
+    op.create_index('ix_contacts_last_name_trgm', 'contacts', ['last_name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'last_name': 'gin_trgm_ops'})
+    op.create_index('ix_contacts_email_trgm', 'contacts', ['email'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER contacts_fts_au")
+        op.execute("DROP TRIGGER contacts_fts_ad")
+        op.execute("DROP TRIGGER contacts_fts_ai")
+        op.execute("DROP TABLE contacts_fts")
+        return
+    op.drop_index('ix_contacts_email_trgm', table_name='contacts')
+    op.drop_index('ix_contacts_last_name_trgm', table_name='contacts')
+    op.drop_index('ix_contacts_first_name_trgm', table_name='contacts')
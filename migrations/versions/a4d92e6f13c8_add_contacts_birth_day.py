@@ -0,0 +1,37 @@
+"""add contacts birth day
+
+Revision ID: a4d92e6f13c8
+Revises: 8c3e51a0d7b2
+Create Date: 2024-07-22 09:31:54.270116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d92e6f13c8'
+down_revision: Union[str, None] = '8c3e51a0d7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birth_day', sa.Integer(), nullable=True))
+    # backfill month * 100 + day of the date of birth
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute("UPDATE contacts SET birth_day = CAST(strftime('%m', date_of_birth) AS INTEGER) * 100 "
+                   "+ CAST(strftime('%d', date_of_birth) AS INTEGER)")
+    else:
+        op.execute("UPDATE contacts SET birth_day = CAST(EXTRACT(MONTH FROM date_of_birth) AS INTEGER) * 100 "
+                   "+ CAST(EXTRACT(DAY FROM date_of_birth) AS INTEGER)")
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('birth_day', existing_type=sa.Integer(), nullable=False)
+    op.create_index('ix_contacts_user_id_birth_day', 'contacts', ['user_id', 'birth_day'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birth_day', table_name='contacts')
+    op.drop_column('contacts', 'birth_day')
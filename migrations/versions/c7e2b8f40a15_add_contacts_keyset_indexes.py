@@ -0,0 +1,37 @@
+"""add contacts keyset indexes
+
+Revision ID: c7e2b8f40a15
+Revises: a4d92e6f13c8
+Create Date: 2024-07-23 16:14:02.551873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2b8f40a15'
+down_revision: Union[str, None] = 'a4d92e6f13c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing contacts get the migration time as creation time
+    op.add_column('contacts', sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), server_default=None)
+    op.create_index('ix_contacts_user_id_created_at_id', 'contacts', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_contacts_user_id_last_name_first_name_id', 'contacts',
+                    ['user_id', 'last_name', 'first_name', 'id'], unique=False)
+    op.drop_index('ix_contacts_user_id_last_name_first_name', table_name='contacts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_contacts_user_id_last_name_first_name', 'contacts',
+                    ['user_id', 'last_name', 'first_name'], unique=False)
+    op.drop_index('ix_contacts_user_id_last_name_first_name_id', table_name='contacts')
+    op.drop_index('ix_contacts_user_id_created_at_id', table_name='contacts')
+    op.drop_column('contacts', 'created_at')
@@ -0,0 +1,30 @@
+"""users avatar variants
+
+Revision ID: d3f6a1b9e2c4
+Revises: c7e2b8f40a15
+Create Date: 2024-07-24 11:02:37.418265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f6a1b9e2c4'
+down_revision: Union[str, None] = 'c7e2b8f40a15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # an existing avatar URL serves every size until the user uploads a new avatar
+    op.alter_column('users', 'avatar', existing_type=sa.String(length=255), type_=sa.JSON(), existing_nullable=True,
+                    postgresql_using="CASE WHEN avatar IS NULL THEN NULL "
+                                     "ELSE json_build_object('64', avatar, '128', avatar, '250', avatar) END")
+
+
+def downgrade() -> None:
+    op.alter_column('users', 'avatar', existing_type=sa.JSON(), type_=sa.String(length=255), existing_nullable=True,
+                    postgresql_using="avatar->>'250'")
@@ -20,6 +20,62 @@ class Settings(BaseSettings):
     cloudinary_api_key: str
     cloudinary_api_secret: str
     origins: List[str]
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pgbouncer: bool = False
+    db_replica_urls: List[str] = []
+    db_replica_check_interval: float = 10
+    db_replica_check_timeout: float = 2
+    db_read_your_writes: float = 5
+    import_batch_size: int = 1000
+    import_max_errors: int = 100
+    export_batch_size: int = 1000
+    contacts_batch_max: int = 1000
+    contacts_lookup_max: int = 100
+    cache_ttl: int = 300
+    cache_retry: float = 5
+    user_cache_ttl: int = 300
+    user_cache_local_ttl: float = 5
+    user_cache_size: int = 1024
+    password_scheme: str = "bcrypt"
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 2
+    mail_from_name: str = "Example email"
+    mail_ssl_tls: bool = True
+    mail_starttls: bool = False
+    mail_use_credentials: bool = True
+    mail_validate_certs: bool = True
+    mail_timeout: float = 30
+    mail_pool_size: int = 2
+    mail_queue_size: int = 10000
+    mail_batch_size: int = 50
+    mail_retries: int = 3
+    mail_retry_backoff: float = 1
+    mail_idle_timeout: float = 60
+    avatar_storage: str = "cloudinary"
+    avatar_max_size: int = 5 * 1024 * 1024
+    media_root: str = "media"
+    media_url: str = "/media"
+    upload_chunk_size: int = 64 * 1024
+    avatar_sizes: List[int] = [64, 128, 250]
+    avatar_max_pixels: int = 25_000_000
+    avatar_quality: int = 85
+    rate_limit_lease_ratio: float = 0.25
+    rate_limit_fail_open: bool = True
+    rate_limit_max_buckets: int = 100000
+    warm_up: bool = True
+    compression_min_size: int = 1024
+    compression_encodings: List[str] = ["zstd", "br", "gzip"]
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+    internal_token: str = ""
     
     class Config:
         env_file = ".env" 
@@ -1,18 +1,211 @@
 import os, sys
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from contextlib import AsyncExitStack
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
 from str.conf.config import settings
+from str.database.models import User
+from str.database.pool import TimedQueuePool, TimedNullPool, get_pool_stats
+from str.database.replicas import ReplicaSet
+from str.services.cache import get_redis
+from str.services.metrics import observe_queries
 
-SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# sync driver -> asyncio driver used by the application engine
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def get_async_url(url: str) -> str:
+    """
+    Convert a database URL to the asyncio driver of the same backend.
 
-# Dependency
-def get_db():
-    db = SessionLocal()
+    :param url: The database URL, e.g. ``postgresql://...`` or ``sqlite:///./test.db``.
+    :type url: str
+    :return: The URL with an asyncio driver (asyncpg for Postgres, aiosqlite for SQLite).
+    :rtype: str
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def get_engine_options(url: str) -> dict:
+    """
+    Build the pool options of an engine from the settings.
+
+    In PgBouncer mode pooling is left to PgBouncer: connections are not kept
+    (NullPool) and asyncpg does not cache prepared statements, which do not survive
+    transaction pooling.
+
+    :param url: The async database URL the engine is created for.
+    :type url: str
+    :return: Keyword arguments for ``create_async_engine``.
+    :rtype: dict
+    """
+    if settings.db_pgbouncer:
+        options = {"poolclass": TimedNullPool}
+        if make_url(url).get_backend_name() == "postgresql":
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+SQLALCHEMY_DATABASE_URL = get_async_url(settings.sqlalchemy_database_url)
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **get_engine_options(SQLALCHEMY_DATABASE_URL))
+
+replicas = ReplicaSet(
+    [create_async_engine(get_async_url(url), **get_engine_options(get_async_url(url)))
+     for url in settings.db_replica_urls],
+    check_interval=settings.db_replica_check_interval,
+    check_timeout=settings.db_replica_check_timeout,
+    read_your_writes=settings.db_read_your_writes,
+    redis=get_redis,
+    retry=settings.cache_retry,
+)
+observe_queries(engine, "primary")
+for replica in replicas.engines:
+    observe_queries(replica, "replica")
+
+
+class PrimarySession(Session):
+    """Session on the primary database; it collects the users whose rows it wrote."""
+
+
+@event.listens_for(PrimarySession, 'after_flush')
+def collect_writers(session, flush_context):
+    writers = session.info.setdefault('writers', set())
+    writers.update(obj.email for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, User))
+
+
+@event.listens_for(PrimarySession, 'after_rollback')
+def forget_writers(session):
+    session.info.pop('writers', None)
+
+
+class PrimaryAsyncSession(AsyncSession):
+    """
+    Async session on the primary database; a commit starts the read-your-writes window
+    of the request's user and of every user row it wrote, before it returns.
+    """
+
+    async def commit(self):
+        await super().commit()
+        writers = self.info.pop('writers', set())
+        writers.add(self.info.get('subject'))
+        for subject in writers:
+            await replicas.mark_write(subject)
+
+
+SessionLocal = async_sessionmaker(bind=engine, class_=PrimaryAsyncSession, sync_session_class=PrimarySession,
+                                  autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def request_subject(request: Request) -> str | None:
+    """
+    Read the user of a request from its bearer token, without verifying it.
+
+    Only used to route reads; authentication is still done by ``Auth.get_current_user``.
+
+    :param request: The incoming request.
+    :type request: Request
+    :return: The ``sub`` claim of the bearer token, or None without a readable token.
+    :rtype: str | None
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
     try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
+def pool_stats() -> dict:
+    """
+    Report the connection pool figures of the application engine for this worker.
+
+    :return: Checked-out, idle, overflow and wait-time figures of the pool.
+    :rtype: dict
+    """
+    return get_pool_stats(engine.pool)
+
+
+async def open_connections(engine: AsyncEngine, count: int):
+    """
+    Open connections of an engine at once and return them to its pool, where they stay idle.
+
+    :param engine: The engine to warm up.
+    :type engine: AsyncEngine
+    :param count: The number of connections to open.
+    :type count: int
+    """
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.execute(text("SELECT 1"))
+
+
+async def warm_up_engines():
+    """
+    Fill the pools of the primary and of every replica, so the first requests of a worker
+    do not wait for connections to be opened. In PgBouncer mode nothing is kept, and one
+    connection only checks that the database is reachable.
+    """
+    count = 1 if settings.db_pgbouncer else settings.db_pool_size
+    await open_connections(engine, count)
+    for replica in replicas.engines:
+        # an unreachable replica is skipped by its health check, it must not stop startup
+        try:
+            await open_connections(replica, count)
+        except (SQLAlchemyError, OSError) as e:
+            print(e)
+
+
+async def dispose_engines():
+    """Close the pooled connections of the primary and of every replica."""
+    for db_engine in (engine, *replicas.engines):
+        await db_engine.dispose()
+
+
+# Dependency
+async def get_db(request: Request):
+    async with SessionLocal(info={"subject": request_subject(request)}) as db:
+        yield db
+
+
+def get_session_factory() -> async_sessionmaker:
+    """
+    Dependency for work done after the response, e.g. in background tasks, which must
+    open their own session: the factory of sessions on the primary.
+    """
+    return SessionLocal
+
+
+async def get_read_db(request: Request):
+    """
+    Dependency for read-only endpoints: a session on a healthy replica, round-robin.
+
+    Falls back to the primary when no replica is configured or healthy, and while the
+    user is in their read-your-writes window.
+    """
+    replica = await replicas.pick(request_subject(request))
+    if replica is None:
+        async with SessionLocal(info={"subject": request_subject(request)}) as db:
+            yield db
+        return
+    async with ReadSessionLocal(bind=replica) as db:
         yield db
-    finally:
-        db.close()
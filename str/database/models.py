@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Boolean, Integer, String, UniqueConstraint, func
+from datetime import datetime
+
+from sqlalchemy import DDL, JSON, Column, Boolean, Index, Integer, String, UniqueConstraint, column, event, func, table
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -13,7 +15,8 @@ class User(Base):
     email = Column(String(250), nullable=False, unique=True)
     password = Column(String(255), nullable=False)
     created_at = Column('crated_at', DateTime, default=func.now())
-    avatar = Column(String(255), nullable=True)
+    # thumbnail URLs by size, e.g. {"64": ..., "128": ..., "250": ...}
+    avatar = Column(JSON(none_as_null=True), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
 
@@ -22,6 +25,11 @@ class Contact(Base):
     __tablename__ = "contacts"
     __table_args__ = (
         UniqueConstraint('id', 'user_id', name='unique_contact4user'),
+        Index('ix_contacts_user_id_id', 'user_id', 'id'),
+        Index('ix_contacts_user_id_last_name_first_name_id', 'user_id', 'last_name', 'first_name', 'id'),
+        Index('ix_contacts_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_contacts_user_id_email', 'user_id', 'email'),
+        Index('ix_contacts_user_id_birth_day', 'user_id', 'birth_day'),
     )
     id = Column(Integer, primary_key=True)
     first_name = Column(String(50), nullable=False)
@@ -30,10 +38,65 @@ class Contact(Base):
     phone_number = Column(String(50), nullable=False)
     date_of_birth= Column(DateTime, nullable= False)
     info = Column(String(350), default= None)
+    # month * 100 + day of date_of_birth, e.g. 229 for Feb 29; kept in sync by set_birth_day
+    birth_day = Column(Integer, nullable=False)
+    # set in Python so the stored value keeps the microseconds a keyset cursor compares against
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
 
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
     user = relationship('User', backref="contacts")
 
+    @validates('date_of_birth')
+    def set_birth_day(self, key, value):
+        self.birth_day = birthday_key(value)
+        return value
+
+
+def birthday_key(value) -> int | None:
+    """
+    Encode the month and day of a date as ``month * 100 + day``.
+
+    :param value: A date of birth.
+    :type value: date | datetime | None
+    :return: The birthday key, e.g. 1231 for December 31, or None without a date.
+    :rtype: int | None
+    """
+    if value is None:
+        return None
+    return value.month * 100 + value.day
+
 
+# Search indexes for contacts: pg_trgm GIN indexes on Postgres, an FTS5 trigram
+# shadow table kept in sync by triggers on SQLite. Mirrors migration 8c3e51a0d7b2.
+CONTACT_SEARCH_DDL = {
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_contacts_first_name_trgm ON contacts USING gin (first_name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_contacts_last_name_trgm ON contacts USING gin (last_name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_contacts_email_trgm ON contacts USING gin (email gin_trgm_ops)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5("
+        "first_name, last_name, email, content='contacts', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+        "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+        "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+        "CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+        "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+        "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); END",
+        "CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+        "INSERT INTO contacts_fts(contacts_fts, rowid, first_name, last_name, email) "
+        "VALUES ('delete', old.id, old.first_name, old.last_name, old.email); "
+        "INSERT INTO contacts_fts(rowid, first_name, last_name, email) "
+        "VALUES (new.id, new.first_name, new.last_name, new.email); END",
+        "INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')",
+    ],
+}
 
+# FTS5 shadow table, queried by rowid (= contacts.id) and ordered by its bm25 rank
+contacts_fts = table('contacts_fts', column('rowid', Integer), column('rank'))
 
+for dialect, statements in CONTACT_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Contact.__table__, 'after_create', DDL(statement).execute_if(dialect=dialect))
+event.listen(Contact.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect='sqlite'))
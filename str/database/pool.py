@@ -0,0 +1,74 @@
+import os
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+
+class TimedPoolMixin:
+    """
+    Pool mixin that records how long each checkout waits for a connection.
+
+    The wait covers queueing for a free slot and opening a new connection when the
+    pool has to grow, i.e. everything a request spends before it can run SQL.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.checked_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        conn = super()._do_get()
+        wait = time.perf_counter() - start
+        self.checkouts += 1
+        self.checked_out += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        return conn
+
+    def _do_return_conn(self, record):
+        self.checked_out -= 1
+        super()._do_return_conn(record)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkouts, pool.wait_total, pool.wait_max = self.checkouts, self.wait_total, self.wait_max
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(TimedPoolMixin, NullPool):
+    pass
+
+
+def get_pool_stats(pool) -> dict:
+    """
+    Collect checkout figures of a connection pool for the current worker process.
+
+    :param pool: The pool of an engine, e.g. ``engine.pool``.
+    :type pool: Pool
+    :return: Worker pid, pool class, checked-out, idle and overflow connections and wait-time figures.
+    :rtype: dict
+    """
+    stats = {
+        "pid": os.getpid(),
+        "pool": type(pool).__name__,
+        "size": 0,
+        "checked_out": getattr(pool, "checked_out", 0),
+        "idle": 0,
+        "overflow": 0,
+        "checkouts": getattr(pool, "checkouts", 0),
+        "wait_total": getattr(pool, "wait_total", 0.0),
+        "wait_max": getattr(pool, "wait_max", 0.0),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), idle=pool.checkedin(),
+                     overflow=max(pool.overflow(), 0))
+    stats["wait_avg"] = stats["wait_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    return stats
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class ReplicaSet:
+    """
+    Round-robin selection of read replicas with health checks and read-your-writes.
+
+    A replica is probed with ``SELECT 1`` at most once per check interval, when it is
+    picked; an unhealthy replica is skipped until its next check. A user who wrote to the
+    primary reads from the primary for the read-your-writes window, so they see their own
+    changes regardless of replication lag; the window should be longer than the lag.
+
+    The window is kept in Redis, so it holds whichever worker serves the next read, and
+    in the worker that made the write, which then needs no round trip. While Redis is
+    unreachable only the local window is kept, and Redis is retried after ``retry`` seconds.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], check_interval: float, check_timeout: float,
+                 read_your_writes: float, redis: Callable[[], Redis] | None = None, retry: float = 5):
+        self.engines = engines
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.read_your_writes = read_your_writes
+        self.redis = redis
+        self.retry = retry
+        self.down_until = 0.0
+        self.position = 0
+        self.status = {}
+        self.writes = {}
+
+    @staticmethod
+    def write_key(subject: str) -> str:
+        return f"replicas:wrote:{subject}"
+
+    def shared(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self.down_until
+
+    def failed(self):
+        self.down_until = time.monotonic() + self.retry
+
+    async def mark_write(self, subject: str | None):
+        """
+        Start the read-your-writes window of a user, in this worker and in Redis.
+
+        :param subject: The user the write was made for, e.g. the email in the JWT ``sub`` claim.
+        :type subject: str | None
+        """
+        if not self.engines or subject is None or self.read_your_writes <= 0:
+            return
+        now = time.monotonic()
+        if len(self.writes) > 10000:
+            self.writes = {key: until for key, until in self.writes.items() if until > now}
+        self.writes[subject] = now + self.read_your_writes
+        if self.shared():
+            try:
+                await self.redis().set(self.write_key(subject), 1, px=int(self.read_your_writes * 1000))
+            except (RedisError, OSError):
+                self.failed()
+
+    async def recently_wrote(self, subject: str | None) -> bool:
+        """
+        Check whether a user is inside their read-your-writes window.
+
+        :param subject: The user to check.
+        :type subject: str | None
+        :return: True if the user's reads must go to the primary.
+        :rtype: bool
+        """
+        if subject is None:
+            return False
+        if self.writes.get(subject, 0) > time.monotonic():
+            return True
+        if not self.shared():
+            return False
+        try:
+            return bool(await self.redis().exists(self.write_key(subject)))
+        except (RedisError, OSError):
+            self.failed()
+            return False
+
+    async def is_healthy(self, engine: AsyncEngine) -> bool:
+        """
+        Check a replica, reusing the last result within the check interval.
+
+        :param engine: The replica engine.
+        :type engine: AsyncEngine
+        :return: True if the replica answered the last check.
+        :rtype: bool
+        """
+        now = time.monotonic()
+        healthy, checked_at = self.status.get(engine, (False, None))
+        if checked_at is not None and now - checked_at < self.check_interval:
+            return healthy
+        try:
+            async with asyncio.timeout(self.check_timeout):
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            healthy = True
+        except (SQLAlchemyError, OSError, TimeoutError):
+            healthy = False
+        self.status[engine] = (healthy, now)
+        return healthy
+
+    async def pick(self, subject: str | None = None) -> AsyncEngine | None:
+        """
+        Pick the replica to serve a read.
+
+        :param subject: The user the read is made for.
+        :type subject: str | None
+        :return: The next healthy replica, or None if the read must go to the primary.
+        :rtype: AsyncEngine | None
+        """
+        if not self.engines or await self.recently_wrote(subject):
+            return None
+        for _ in range(len(self.engines)):
+            engine = self.engines[self.position]
+            self.position = (self.position + 1) % len(self.engines)
+            if await self.is_healthy(engine):
+                return engine
+        return None
@@ -1,17 +1,89 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Sequence
+import base64
+import calendar
 import datetime as dt
-from sqlalchemy import or_, and_
-from sqlalchemy.orm import Session
+import json
+from sqlalchemy import or_, and_, bindparam, case, delete, func, insert, select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
 
-from str.database.models import Contact, User
-from str.schemas import ContactModel
+from str.database.models import Contact, User, birthday_key, contacts_fts
+from str.schemas import ContactModel, ContactOperation
+from str.services.cache import contacts_cache
 
 
-async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[Contact]:
+# sort orders of contact listing; each ends with the primary key so keys are unique
+SORT_ORDERS = {
+    'id': (Contact.id,),
+    'name': (Contact.last_name, Contact.first_name, Contact.id),
+    'created': (Contact.created_at, Contact.id),
+}
+
+
+def project(stmt, fields: Sequence[str] | None):
+    """
+    Restrict a contact query to some columns; the others are neither selected nor loaded.
+
+    :param stmt: A ``select(Contact)`` statement.
+    :type stmt: Select
+    :param fields: The names of the columns to load, all columns if None. The primary key is always loaded.
+    :type fields: Sequence[str] | None
+    :return: The statement.
+    :rtype: Select
+    """
+    if fields is None:
+        return stmt
+    return stmt.options(load_only(*[getattr(Contact, name) for name in fields], raiseload=True))
+
+
+def encode_cursor(contact: Contact, sort: str) -> str:
+    """
+    Encodes the sort key of a contact as an opaque cursor for keyset pagination.
+
+    :param contact: The last contact of a page.
+    :type contact: Contact
+    :param sort: The sort order of the listing.
+    :type sort: str
+    :return: The cursor to continue the listing after the contact.
+    :rtype: str
+    """
+    key = [getattr(contact, column.key) for column in SORT_ORDERS[sort]]
+    key = [value.isoformat() if isinstance(value, dt.datetime) else value for value in key]
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """
+    Decodes a cursor produced by :func:`encode_cursor` for the given sort order.
+
+    :param cursor: The cursor from a previous page.
+    :type cursor: str
+    :param sort: The sort order of the listing.
+    :type sort: str
+    :return: The sort key to continue the listing after.
+    :rtype: tuple
+    :raises ValueError: If the cursor is malformed or was issued for another sort order.
+    """
+    try:
+        cursor_sort, *key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if cursor_sort != sort or len(key) != len(SORT_ORDERS[sort]):
+            raise ValueError("Cursor of another sort order")
+        if sort == 'created':
+            key[0] = dt.datetime.fromisoformat(key[0])
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    return tuple(key)
+
+
+async def get_contacts(skip: int, limit: int, user: User, db: AsyncSession, sort: str = 'id',
+                       after: tuple | None = None, fields: Sequence[str] | None = None) -> List[Contact]:
     """
     Retrieves a list of contacts for a specific user with specified pagination parameters.
 
+    Pages can be addressed by offset (``skip``) or, cheaper for deep pages, by the sort
+    key of the last contact of the previous page (``after``, see :func:`decode_cursor`).
+
     :param skip: The number of contacts to skip.
     :type skip: int
     :param limit: The maximum number of contacts to return.
@@ -19,14 +91,56 @@ async def get_contacts(skip: int, limit: int, user: User, db: Session) -> List[C
     :param user: The user to retrieve conatcts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param sort: The sort order, one of ``id``, ``name`` or ``created``.
+    :type sort: str
+    :param after: The sort key to continue after, or None to start from the first contact.
+    :type after: tuple | None
+    :param fields: The columns to load, all by default; the sort key is always loaded.
+    :type fields: Sequence[str] | None
     :return: A list of contacts.
     :rtype: List[Contact]
     """
-    return db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
+    columns = SORT_ORDERS[sort]
+    stmt = select(Contact).filter(Contact.user_id == user.id)
+    if after is not None:
+        stmt = stmt.filter(tuple_(*columns) > tuple_(*after))
+    if fields is not None:
+        fields = [*fields, *(column.key for column in columns if column.key not in fields)]
+    stmt = project(stmt, fields).order_by(*columns).offset(skip).limit(limit)
+    contacts = await db.execute(stmt)
+    return contacts.scalars().all()
+
+
+EXPORT_COLUMNS = (Contact.id, Contact.first_name, Contact.last_name, Contact.email, Contact.phone_number,
+                  Contact.date_of_birth, Contact.info)
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int) -> AsyncIterator[list]:
+    """
+    Streams all contacts of a specific user from a server-side cursor, in batches.
 
+    Only plain rows are fetched, without building ORM objects, and at most one batch is
+    held in memory at a time.
 
-async def get_contact(contact_id: int, user: User, db: Session) -> Contact|None:
+    :param user: The user to export contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param batch_size: The number of rows fetched from the cursor at a time.
+    :type batch_size: int
+    :return: Batches of contact rows as mappings of :data:`EXPORT_COLUMNS`, ordered by id.
+    :rtype: AsyncIterator[list]
+    """
+    stmt = select(*EXPORT_COLUMNS).filter(Contact.user_id == user.id).order_by(Contact.id)\
+                                   .execution_options(yield_per=batch_size)
+    result = await db.stream(stmt)
+    async for rows in result.mappings().partitions():
+        yield rows
+
+
+async def get_contact(contact_id: int, user: User, db: AsyncSession,
+                      fields: Sequence[str] | None = None) -> Contact|None:
     """
     Retrieves a single contact with the specified ID for a specific user.
 
@@ -35,54 +149,156 @@ async def get_contact(contact_id: int, user: User, db: Session) -> Contact|None:
     :param user: The user to retrieve the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param fields: The columns to load, all by default.
+    :type fields: Sequence[str] | None
     :return: The contact with the specified ID, or None if it does not exist.
     :rtype: Contact | None
     """
-    return db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    contact = await db.execute(project(stmt, fields))
+    return contact.scalars().first()
+
+
+async def get_contacts_by_ids(ids: Sequence[int], user: User, db: AsyncSession,
+                              fields: Sequence[str] | None = None) -> List[Contact]:
+    """
+    Retrieves the contacts with the given IDs for a specific user, with one
+    ``WHERE user_id = ? AND id IN (...)`` query.
+
+    :param ids: The IDs of the contacts to retrieve.
+    :type ids: Sequence[int]
+    :param user: The user to retrieve the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param fields: The columns to load, all by default.
+    :type fields: Sequence[str] | None
+    :return: The contacts found, in the order of ``ids``; IDs of no contact of the user are left out.
+    :rtype: List[Contact]
+    """
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id, Contact.id.in_(ids)))
+    contacts = {contact.id: contact for contact in (await db.execute(project(stmt, fields))).scalars().all()}
+    return [contacts[contact_id] for contact_id in ids if contact_id in contacts]
+
+
+# trigram indexes (pg_trgm, FTS5 trigram tokenizer) only serve queries of 3+ characters
+SEARCH_MIN_LENGTH = 3
+
+
+def search_statement(query: str, columns: list, user: User, dialect: str):
+    """
+    Builds a ranked search query over the given contact columns for a specific user.
+
+    On Postgres the ``ILIKE`` filter is served by the pg_trgm GIN indexes and results are
+    ranked by trigram similarity. On SQLite the FTS5 trigram table is matched and results
+    are ranked by bm25. Any other backend falls back to ``ILIKE`` ordered by name.
+
+    :param query: The text to search for.
+    :type query: str
+    :param columns: The contact columns to search in.
+    :type columns: list
+    :param user: The user to search contacts for.
+    :type user: User
+    :param dialect: The name of the database dialect.
+    :type dialect: str
+    :return: The search statement, best matches first.
+    :rtype: Select
+    """
+    stmt = select(Contact).filter(Contact.user_id == user.id)
+    matches = or_(*[column.ilike(f"%{query}%") for column in columns])
+    if dialect == 'postgresql':
+        rank = func.greatest(*[func.similarity(column, query) for column in columns])
+        return stmt.filter(matches).order_by(rank.desc(), Contact.id)
+    if dialect == 'sqlite' and len(query) >= SEARCH_MIN_LENGTH:
+        names = ' '.join(column.key for column in columns)
+        phrase = query.replace('"', '""')
+        return stmt.join(contacts_fts, contacts_fts.c.rowid == Contact.id)\
+                   .filter(text("contacts_fts MATCH :match").bindparams(match=f'{{{names}}}: "{phrase}"'))\
+                   .order_by(contacts_fts.c.rank, Contact.id)
+    return stmt.filter(matches).order_by(Contact.last_name, Contact.first_name, Contact.id)
 
 
-async def find_name(contact_name: str, user: User, db: Session) -> Contact|None:
+async def find_name(contact_name: str, skip: int, limit: int, user: User, db: AsyncSession,
+                    fields: Sequence[str] | None = None) -> List[Contact]:
     """
-    Retrieves a contact matching the given name for a specific user.
+    Retrieves a ranked page of contacts whose first or last name matches the given name for a specific user.
 
-    :param contact_name: The name of the contact to retrieve.
+    :param contact_name: The name of the contact to search.
     :type contact_name: str
-    :param user: The user to retrieve the contact for.
+    :param skip: The number of contacts to skip.
+    :type skip: int
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
+    :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: Returns the first contact matching the given first name or last name., or None if it does not exist.
-    :rtype: Contact | None
+    :type db: AsyncSession
+    :param fields: The columns to load, all by default.
+    :type fields: Sequence[str] | None
+    :return: The contacts matching the given first name or last name, best matches first.
+    :rtype: List[Contact]
     """
-    contacts = db.query(Contact).filter(
-        or_(
-            and_(Contact.user_id == user.id, Contact.first_name.ilike(f"%{contact_name}%")),
-            and_(Contact.user_id == user.id, Contact.last_name.ilike(f"%{contact_name}%"))
-        )
-    ).first()
-    return contacts
+    stmt = search_statement(contact_name, [Contact.first_name, Contact.last_name], user, db.get_bind().dialect.name)
+    contacts = await db.execute(project(stmt, fields).offset(skip).limit(limit))
+    return contacts.scalars().all()
      
 
-async def find_email(contact_email:str, user: User, db: Session) -> Contact|None:
+async def find_email(contact_email: str, skip: int, limit: int, user: User, db: AsyncSession,
+                     fields: Sequence[str] | None = None) -> List[Contact]:
     """
-    Retrieves a contact matching the given email for a specific user.
+    Retrieves a ranked page of contacts whose email matches the given email for a specific user.
 
     :param contact_email: Email of the contact to search.
     :type contact_email: str
-    :param user: The user to retrieve the contact for.
+    :param skip: The number of contacts to skip.
+    :type skip: int
+    :param limit: The maximum number of contacts to return.
+    :type limit: int
+    :param user: The user to retrieve the contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: Returns the first contact matching the given email, or None if it does not exist.
-    :rtype: Contact | None
+    :type db: AsyncSession
+    :param fields: The columns to load, all by default.
+    :type fields: Sequence[str] | None
+    :return: The contacts matching the given email, best matches first.
+    :rtype: List[Contact]
+    """
+    stmt = search_statement(contact_email, [Contact.email], user, db.get_bind().dialect.name)
+    contacts = await db.execute(project(stmt, fields).offset(skip).limit(limit))
+    return contacts.scalars().all()
+
+
+def birthday_ranges(today: dt.date, days: int) -> List[tuple]:
+    """
+    Converts a window of days starting today into ranges of birthday keys (``month * 100 + day``).
+
+    A window running past December 31 is split in two ranges. Feb 29 birthdays are
+    celebrated on Feb 28 in common years, so a range ending on Feb 28 of a common year
+    is extended to Feb 29.
+
+    :param today: The first day of the window.
+    :type today: date
+    :param days: The length of the window in days, today included.
+    :type days: int
+    :return: The inclusive ``(first, last)`` birthday key ranges covered by the window.
+    :rtype: List[tuple]
     """
-    return db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.email.ilike(f"%{contact_email}%"))).first()
+    if days >= 366:
+        return [(101, 1231)]
+    last_day = today + dt.timedelta(days=days - 1)
+    end = birthday_key(last_day)
+    if end == 228 and not calendar.isleap(last_day.year):
+        end = 229
+    if last_day.year == today.year:
+        return [(birthday_key(today), end)]
+    return [(birthday_key(today), 1231), (101, end)]
 
 
-async def get_upcoming_birthdays(skip: int, limit: int, user: User, db: Session) -> List[Contact]|None:
+async def get_upcoming_birthdays(skip: int, limit: int, user: User, db: AsyncSession, days: int = 7,
+                                 today: dt.date | None = None, fields: Sequence[str] | None = None) -> List[Contact]:
     """
-    Retrieves a list of 7-days-upcoming contacts birthdays for a specific user with specified pagination parameters.
+    Retrieves a list of contacts with birthdays in the next days for a specific user with specified pagination parameters.
 
     :param skip: The number of contacts to skip.
     :type skip: int
@@ -91,30 +307,27 @@ async def get_upcoming_birthdays(skip: int, limit: int, user: User, db: Session)
     :param user: The user to retrieve contacts for.
     :type user: User
     :param db: The database session.
-    :type db: Session
-    :return: A list of contacts birthdays, or None, if not exist upcoming birthdays.
-    :rtype: List[Contact]|None
-    """
-    current_year = dt.datetime.now().year
-    tdate= dt.datetime.today().date()
-    upcoming_birthdays=[] # створюємо список для результатів
-    contacts:Contact|List[Contact] = db.query(Contact).filter(Contact.user_id == user.id).offset(skip).limit(limit).all()
-    if contacts:
-        for contact in contacts: # перебираємо користувачів
-                birthdate:Optional[dt.date] = contact.date_of_birth # отримуємо дату народження людини  
-                if birthdate is not None:
-                    new_bdate = birthdate.replace(year=current_year)
-                    days_between=(new_bdate-tdate).days # рахуємо різницю між зараз і днем народження цьогоріч у днях
-                    if 0<=days_between<7: # якщо день народження протягом 7 днів від сьогодні
-                        upcoming_birthdays.append(contact) 
-                            # Додаємо запис у список.
-        if not upcoming_birthdays :
-            return "There are no contacts scheduled for greetings in the next week."
-        else:
-            return upcoming_birthdays
-
-
-async def create_contact(body: ContactModel, user: User, db: Session) -> Contact:
+    :type db: AsyncSession
+    :param days: The length of the window in days, today included.
+    :type days: int
+    :param today: The first day of the window, today by default.
+    :type today: date | None
+    :param fields: The columns to load, all by default.
+    :type fields: Sequence[str] | None
+    :return: The contacts with upcoming birthdays, nearest birthday first.
+    :rtype: List[Contact]
+    """
+    today = today or dt.date.today()
+    ranges = birthday_ranges(today, days)
+    start = ranges[0][0]
+    stmt = select(Contact).filter(Contact.user_id == user.id)\
+                          .filter(or_(*[Contact.birth_day.between(first, last) for first, last in ranges]))\
+                          .order_by(case((Contact.birth_day >= start, 0), else_=1), Contact.birth_day, Contact.id)
+    contacts = await db.execute(project(stmt, fields).offset(skip).limit(limit))
+    return contacts.scalars().all()
+
+
+async def create_contact(body: ContactModel, user: User, db: AsyncSession) -> Contact:
     """
     Creates a new contact for a specific user.
 
@@ -123,7 +336,7 @@ async def create_contact(body: ContactModel, user: User, db: Session) -> Contact
     :param user: The user to create the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The newly created contact.
     :rtype: Contact
     """
@@ -135,12 +348,112 @@ async def create_contact(body: ContactModel, user: User, db: Session) -> Contact
                       info=body.info,
                       user_id=user.id)
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
+    await contacts_cache.bump(user.id)
+    await db.refresh(contact)
     return contact
 
 
-async def remove_contact(contact_id: int, user: User, db: Session) -> Contact | None:
+def contact_row(body: ContactModel, user: User) -> dict:
+    """
+    Builds the column values of a contact for bulk statements, which bypass the ORM.
+
+    :param body: The data for the contact.
+    :type body: ContactModel
+    :param user: The owner of the contact.
+    :type user: User
+    :return: The column values, including the derived birthday key.
+    :rtype: dict
+    """
+    return {**body.model_dump(), "birth_day": birthday_key(body.date_of_birth), "user_id": user.id}
+
+
+async def create_contacts(bodies: List[ContactModel], user: User, db: AsyncSession) -> int:
+    """
+    Creates new contacts for a specific user with one bulk insert.
+
+    The rows are sent as a single executemany (SQLite) or multi-row ``INSERT ... VALUES``
+    (Postgres) instead of one add, commit and refresh per contact.
+
+    :param bodies: The data for the contacts to create.
+    :type bodies: List[ContactModel]
+    :param user: The user to create the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of created contacts.
+    :rtype: int
+    """
+    if not bodies:
+        return 0
+    rows = [contact_row(body, user) for body in bodies]
+    await db.execute(insert(Contact), rows)
+    await db.commit()
+    await contacts_cache.bump(user.id)
+    return len(rows)
+
+
+async def apply_contact_batch(operations: List[ContactOperation], user: User, db: AsyncSession) -> List[dict]:
+    """
+    Applies a batch of create, update and delete operations for a specific user in one transaction.
+
+    Each kind of operation runs as one set-based statement, in the order creates, updates,
+    deletes: a multi-row ``INSERT ... RETURNING``, an executemany
+    ``UPDATE ... WHERE user_id = ? AND id = ?`` and ``DELETE ... WHERE user_id = ? AND id IN (...)``.
+    The ids to update or delete are checked against the user's contacts with one query first.
+    Each contact must be the subject of one operation at most (see ``ContactBatch.repeated_ids``),
+    so grouping the operations by kind gives the same result as applying them in request order.
+
+    :param operations: The operations to apply.
+    :type operations: List[ContactOperation]
+    :param user: The user to apply the operations for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The result of each operation, in request order: its index, op, contact id and status.
+    :rtype: List[dict]
+    """
+    results = [{"index": index, "op": operation.op, "id": operation.id, "status": "not_found"}
+               for index, operation in enumerate(operations)]
+    creates = [index for index, operation in enumerate(operations) if operation.op == 'create']
+    updates = [index for index, operation in enumerate(operations) if operation.op == 'update']
+    deletes = [index for index, operation in enumerate(operations) if operation.op == 'delete']
+
+    ids = {operations[index].id for index in updates + deletes}
+    owned = set()
+    if ids:
+        stmt = select(Contact.id).filter(and_(Contact.user_id == user.id, Contact.id.in_(ids)))
+        owned = set((await db.execute(stmt)).scalars().all())
+
+    if creates:
+        stmt = insert(Contact).returning(Contact.id, sort_by_parameter_order=True)
+        new_ids = (await db.execute(stmt, [contact_row(operations[index].contact, user) for index in creates])).scalars()
+        for index, contact_id in zip(creates, new_ids):
+            results[index].update(id=contact_id, status="created")
+
+    updates = [index for index in updates if operations[index].id in owned]
+    if updates:
+        table = Contact.__table__
+        stmt = update(table).where(and_(table.c.id == bindparam('contact_id'), table.c.user_id == user.id))
+        await db.execute(stmt, [{"contact_id": operations[index].id, **contact_row(operations[index].contact, user)}
+                                for index in updates])
+        for index in updates:
+            results[index]["status"] = "updated"
+
+    deletes = [index for index in deletes if operations[index].id in owned]
+    if deletes:
+        stmt = delete(Contact).filter(and_(Contact.user_id == user.id,
+                                           Contact.id.in_({operations[index].id for index in deletes})))
+        await db.execute(stmt)
+        for index in deletes:
+            results[index]["status"] = "deleted"
+
+    await db.commit()
+    await contacts_cache.bump(user.id)
+    return results
+
+
+async def remove_contact(contact_id: int, user: User, db: AsyncSession) -> Contact | None:
     """
     Removes a single contact with the specified ID for a specific user.
     :param contact_id: The ID of the contact to remove.
@@ -148,18 +461,20 @@ async def remove_contact(contact_id: int, user: User, db: Session) -> Contact |
     :param user: The user to remove the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The removed contact, or None if it does not exist.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    contact = (await db.execute(stmt)).scalars().first()
     if contact:
-        db.delete(contact)
-        db.commit()
+        await db.delete(contact)
+        await db.commit()
+        await contacts_cache.bump(user.id)
     return contact
 
 
-async def update_contact(contact_id: int,  body: ContactModel, user: User, db: Session) -> Contact | None:
+async def update_contact(contact_id: int,  body: ContactModel, user: User, db: AsyncSession) -> Contact | None:
     """
     Update a single contact with the specified ID for a specific user.
 
@@ -170,11 +485,12 @@ async def update_contact(contact_id: int,  body: ContactModel, user: User, db: S
     :param user: The user to update the contact for.
     :type user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The updated contact, or None if it does not exist.
     :rtype: Contact | None
     """
-    contact = db.query(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id)).first()
+    stmt = select(Contact).filter(and_(Contact.user_id == user.id, Contact.id == contact_id))
+    contact = (await db.execute(stmt)).scalars().first()
     if contact:      
         contact.first_name = body.first_name 
         contact.last_name = body.last_name
@@ -182,5 +498,6 @@ async def update_contact(contact_id: int,  body: ContactModel, user: User, db: S
         contact.phone_number = body.phone_number
         contact.date_of_birth = body.date_of_birth
         contact.info = body.info
-        db.commit()
+        await db.commit()
+        await contacts_cache.bump(user.id)
     return contact
\ No newline at end of file
@@ -1,65 +1,67 @@
-from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from typing import Callable
+
+from sqlalchemy import and_, bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from str.database.models import User
 from str.schemas import UserModel
+from str.services.cache import user_cache
 
 
-async def get_user_by_email(email: str, db: Session) -> User:
+async def get_user_by_email(email: str, db: AsyncSession) -> User:
     """
     Retrieves a user matching the given email for a specific session.
     
     :param email: Email for find a user.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Returns the user matching the given email.
     :rtype: User
     """
-    return db.query(User).filter(User.email == email).first()
+    stmt = select(User).filter(User.email == email)
+    user = await db.execute(stmt)
+    return user.scalars().first()
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     Creating a new user.
+
+    The avatar is left empty; it is resolved after signup (see :func:`fill_avatar`).
     
     :param body: The data for create a user.
     :type body: UserModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: Returns a newly created user.
     :rtype: User
     """
-    avatar = None
-    try:
-        g = Gravatar(body.email)
-        avatar = g.get_image()
-    except Exception as e:
-        print(e)
-    new_user = User(**body.dict(), avatar=avatar)
+    new_user = User(**body.dict())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
-async def confirmed_email(email: str, db: Session) -> User:
+async def confirmed_email(email: str, db: AsyncSession) -> User:
     """
     Confirm the email address of a user.
 
     :param email: the email address to confirm.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: This function  returns user object.
     :rtype: User
     """
     user: User = await get_user_by_email(email, db)
     if user is not None:
         user.confirmed = True
-        db.commit()
+        await db.commit()
+        await user_cache.invalidate(email)
     return user
 
-async def update_token(user: User, token: str | None, db: Session) -> User:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> User:
     """
     Update a token for a user.
 
@@ -68,28 +70,101 @@ async def update_token(user: User, token: str | None, db: Session) -> User:
     :param token: the token for update, or None, if does not exist.
     :type token: str|None
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: This function  returns user object.
     :rtype: User
     """
     user.refresh_token = token
-    db.commit()
+    await db.commit()
+    await user_cache.invalidate(user.email)
     return user
 
-async def update_avatar(email: str, url: str, db: Session) -> User:
+async def update_password(user: User, password: str, db: AsyncSession) -> User:
+    """
+    Update the password hash of a user, e.g. when it is rehashed with new parameters.
+
+    :param user: the user to update the password hash for.
+    :type user: User
+    :param password: the new password hash.
+    :type password: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: This function  returns user object.
+    :rtype: User
+    """
+    user.password = password
+    await db.commit()
+    return user
+
+async def update_avatar(email: str, avatar: dict, db: AsyncSession) -> User:
     """
     Update the avatar of a user.
 
     :param email: the email address of the user.
     :type email: str.
-    :param url: the  url-address for a new avatar.
-    :type url: str.
+    :param avatar: the url-addresses of the new avatar thumbnails, by size.
+    :type avatar: dict.
     :param db: The database session.
-    :type db: Session.
+    :type db: AsyncSession.
     :return: The user with updated avatar.
     :rtype: User.
     """
     user = await get_user_by_email(email, db)
-    user.avatar = url
-    db.commit()
-    return user
\ No newline at end of file
+    user.avatar = avatar
+    await db.commit()
+    await user_cache.invalidate(email)
+    return user
+
+async def fill_avatar(email: str, avatar: dict, db: AsyncSession) -> bool:
+    """
+    Set the avatar of a user who has none yet; an avatar uploaded in the meantime is kept.
+
+    :param email: the email address of the user.
+    :type email: str
+    :param avatar: the url-addresses of the avatar thumbnails, by size.
+    :type avatar: dict
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: True if the avatar was set.
+    :rtype: bool
+    """
+    stmt = update(User).filter(and_(User.email == email, User.avatar.is_(None))).values(avatar=avatar)
+    result = await db.execute(stmt)
+    await db.commit()
+    await user_cache.invalidate(email)
+    return result.rowcount > 0
+
+
+async def fill_missing_avatars(resolve: Callable[[str], dict], batch_size: int, db: AsyncSession) -> int:
+    """
+    Set the avatars of all users who have none, batch by batch.
+
+    Users are read in keyset order by id, and each batch is written with one
+    executemany ``UPDATE`` and committed, so the job can be stopped and rerun at any point.
+    Only the rows the ``UPDATE`` changed are counted, where the driver reports them for
+    an executemany; otherwise every user of a batch is.
+
+    :param resolve: Builds the avatar of a user from their email.
+    :type resolve: Callable[[str], dict]
+    :param batch_size: The number of users per batch.
+    :type batch_size: int
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of avatars set.
+    :rtype: int
+    """
+    table = User.__table__
+    stmt = update(table).where(and_(table.c.id == bindparam('user_id'), table.c.avatar.is_(None)))
+    filled, last_id = 0, 0
+    while True:
+        users = (await db.execute(select(User.id, User.email).filter(and_(User.avatar.is_(None), User.id > last_id))
+                                  .order_by(User.id).limit(batch_size))).all()
+        if not users:
+            return filled
+        result = await db.execute(stmt, [{"user_id": user.id, "avatar": resolve(user.email)} for user in users])
+        await db.commit()
+        for user in users:
+            await user_cache.invalidate(user.email)
+        # users given an avatar since the batch was read are not updated again
+        filled += result.rowcount if result.supports_sane_multi_rowcount() else len(users)
+        last_id = users[-1].id
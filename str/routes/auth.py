@@ -2,21 +2,23 @@ from typing import List
 
 from fastapi import APIRouter, HTTPException, Depends, status, Security
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
-from fastapi_limiter.depends import RateLimiter
+from str.services.rate_limit import RateLimiter
 from str.services.email import send_email
-from str.database.db import get_db
+from str.database.db import get_db, get_session_factory
 from str.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 import str.repository.users as repository_users
 from str.services.auth import auth_service
+from str.services.avatars import resolve_gravatar
 
 router = APIRouter(prefix='/auth', tags=["auth"])
 security = HTTPBearer()
 
 # 
 @router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED, description='No more than 10 requests per minute')
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: AsyncSession = Depends(get_db),
+                 session_factory: async_sessionmaker = Depends(get_session_factory)):
     """
     Create a new user account.
 
@@ -27,7 +29,9 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     :param request: The request object to get the base URL.
     :type request: Request
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
+    :param session_factory: The session factory dependency, for the avatar background task.
+    :type session_factory: async_sessionmaker, optional
     :return: The created user and a success message.
     :rtype: dict
     :raises HTTPException: If an account with the given email already exists.
@@ -35,20 +39,21 @@ async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Re
     exist_user = await repository_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Account already exists")
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
+    background_tasks.add_task(resolve_gravatar, new_user.email, session_factory)
     background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
     return {"user": new_user, "detail": "User successfully created. Check your email for confirmation."}
 
 @router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Authenticate a user and return JWT tokens.
 
     :param body: The OAuth2 password request form containing login credentials.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :return: The access and refresh tokens.
     :rtype: dict
     :raises HTTPException: If the email is invalid, email is not confirmed, or the password is invalid.
@@ -58,8 +63,11 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_and_update_password(body.password, user.password)
+    if not verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid password")
+    if new_hash:
+        await repository_users.update_password(user, new_hash, db)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
@@ -67,14 +75,14 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     Confirm a user's email address.
 
     :param token: The token sent to the user's email for confirmation.
     :type token: str
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :return: A confirmation message.
     :rtype: dict
     :raises HTTPException: If the verification fails or the email is already confirmed.
@@ -90,14 +98,14 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_db)):
     """
     Refresh JWT tokens.
 
     :param credentials: The HTTP authorization credentials containing the refresh token.
     :type credentials: HTTPAuthorizationCredentials
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :return: The new access and refresh tokens.
     :rtype: dict
     :raises HTTPException: If the refresh token is invalid or does not match the stored token.
@@ -117,7 +125,7 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
 
 @router.post('/request_email')
 async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_db)):
     """
     Request email confirmation.
 
@@ -128,7 +136,7 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     :param request: The request object to get the base URL.
     :type request: Request
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :return: A message indicating that the confirmation email has been sent.
     :rtype: dict
     """
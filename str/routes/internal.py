@@ -0,0 +1,92 @@
+import secrets
+
+from fastapi import APIRouter, Depends, HTTPException, Security, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from str.conf.config import settings
+from str.database.db import pool_stats
+from str.schemas import PoolStats, UserCacheStats
+from str.services.cache import user_cache
+from str.services.email import mailer
+from str.services.metrics import registry, stats_metrics
+from str.services.rate_limit import RateLimiter
+
+internal_bearer = HTTPBearer(auto_error=False)
+
+
+async def internal_access(credentials: HTTPAuthorizationCredentials | None = Security(internal_bearer)):
+    """
+    Dependency of the internal endpoints: only requests bearing ``internal_token`` are served.
+
+    The endpoints report figures of the worker, its pool and its services, so without a
+    configured token they are disabled and answer 404.
+
+    :param credentials: The bearer token of the request.
+    :type credentials: HTTPAuthorizationCredentials | None
+    :raises HTTPException: 404 if no token is configured, 401 if the request does not bear it.
+    """
+    if not settings.internal_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(credentials.credentials.encode(),
+                                                         settings.internal_token.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid internal token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(prefix='/internal', tags=["internal"], dependencies=[Depends(internal_access)])
+# served at the root, where Prometheus looks for it
+metrics_router = APIRouter(tags=["internal"], dependencies=[Depends(internal_access)])
+
+
+@registry.collector
+def service_metrics():
+    pool = pool_stats()
+    yield from stats_metrics("db_pool", {"size": pool["size"], "checked_out": pool["checked_out"], "idle": pool["idle"],
+                                         "overflow": pool["overflow"], "wait_max_seconds": pool["wait_max"],
+                                         "checkouts": pool["checkouts"], "wait_seconds": pool["wait_total"]},
+                             counters=("checkouts", "wait_seconds"), help="Database connection pool: ")
+    yield from stats_metrics("rate_limit", RateLimiter.stats, counters=RateLimiter.stats,
+                             help="Rate limiter: ")
+    cache = user_cache.get_stats()
+    yield from stats_metrics("user_cache", cache, counters=("local_hits", "redis_hits", "misses"),
+                             help="Authenticated-user cache: ")
+    yield from stats_metrics("mail", {**mailer.stats, "queue_size": mailer.queue.qsize() if mailer.queue else 0},
+                             counters=mailer.stats, help="Mailer: ")
+
+
+@router.get("/pool", response_model=PoolStats)
+async def read_pool_stats():
+    """
+    Report the database connection pool figures of the worker serving the request.
+
+    :return: Checked-out, idle and overflow connections and checkout wait times.
+    :rtype: PoolStats
+    """
+    return pool_stats()
+
+
+@router.get("/user-cache", response_model=UserCacheStats)
+async def read_user_cache_stats():
+    """
+    Report the hit and miss counters of the authenticated-user cache of the worker serving the request.
+
+    :return: Hits of each tier, misses and the number of users held by the worker.
+    :rtype: UserCacheStats
+    """
+    return user_cache.get_stats()
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    """
+    Report the metrics of the worker serving the request, in the Prometheus text format.
+
+    Request latencies by route, requests in flight, database statement timings, and the
+    counters of the connection pool, rate limiter, user cache and mailer. Prometheus
+    authenticates with ``internal_token``, set as the bearer token of the scrape job.
+
+    :return: The metrics.
+    :rtype: PlainTextResponse
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
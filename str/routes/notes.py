@@ -1,133 +1,263 @@
+import datetime as dt
 from typing import List
-from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, File, Header, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
 from str.database.models import User
-from str.database.db import get_db
-from str.schemas import ContactModel, ContactResponse
+from str.database.db import get_db, get_read_db
+from str.schemas import ContactModel, ContactResponse, ContactImportResult, ContactBatch, ContactBatchResult, \
+    ContactLookup, ContactLookupResult
 from str.services.auth import auth_service
+from str.services.cache import contacts_cache
+from str.services.rate_limit import RateLimiter
+from str.services.serializers import RowSerializer, parse_fields, sparse_serializer
+from str.conf.config import settings
 import str.repository.notes as repository_notes
+from str.services import contact_files
 
 
 router = APIRouter(prefix='/contacts', tags=["contacts"])
 
+# contacts read by our own queries are serialized without revalidation; cached reads are
+# answered with the JSON bytes kept in the cache
+CONTACT = RowSerializer(ContactResponse)
 
-@router.get("/search", response_model=ContactResponse|List[ContactResponse], description='No more than 10 requests per minute',
+
+def contact_fields(fields: str | None = Query(default=None, examples=["id,first_name,phone_number"],
+                                              description="The contact fields to return, comma-separated; all by default")
+                   ) -> RowSerializer:
+    """
+    Dependency for sparse fieldsets: the serializer of the requested contact fields.
+
+    Its ``fields`` are also passed to the repository, so only these columns are read.
+
+    :param fields: The comma-separated field names.
+    :type fields: str | None
+    :return: The serializer of the fields.
+    :rtype: RowSerializer
+    :raises HTTPException: If a field is not a contact field.
+    """
+    if fields is None:
+        return CONTACT
+    try:
+        return sparse_serializer(ContactResponse, parse_fields(ContactResponse, fields))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/search", response_model=List[ContactResponse], description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def find_contacts(query: str,  db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def find_contacts(query: str, skip: int = 0, limit: int = 100, serializer: RowSerializer = Depends(contact_fields),
+                        db: AsyncSession = Depends(get_read_db),
+                        current_user: User = Depends(auth_service.get_current_user)):
     """
     This function searches for contacts that match the given query (name or surname)
     for the current authenticated user.
     
     :param query: The query string to search for in contact names or surnames.
     :type query: str.
+    :param skip: The number of records to skip.
+    :type skip: int, optional
+    :param limit: The maximum number of records to return.
+    :type limit: int, optional
+    :param serializer: The serializer of the requested fields, see the ``fields`` parameter.
+    :type serializer: RowSerializer
     :param db: The database session.
-    :type db: Session.
+    :type db: AsyncSession.
     :param current_user: The current authenticated user dependency. 
     :type current_user: User.
-    :return: The contact that match the query.
-    :rtype: Contact.
-    :raises HTTPException: If no contacts are found that match the query, raises a 404 HTTP exception.
+    :return: The contacts that match the query, best matches first.
+    :rtype: List[ContactResponse]
     """
-    contacts = await repository_notes.find_name(query, current_user, db)
-    if  contacts is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contacts
+    contacts = await repository_notes.find_name(query, skip, limit, current_user, db, serializer.fields)
+    return Response(serializer.dump_list(contacts), media_type="application/json")
 
-@router.get("/email", response_model=ContactResponse|List[ContactResponse], description='No more than 10 requests per minute',
+@router.get("/email", response_model=List[ContactResponse], description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def find_contacts_for_email(contact_email:str,  db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def find_contacts_for_email(contact_email: str, skip: int = 0, limit: int = 100,
+                                  serializer: RowSerializer = Depends(contact_fields),
+                                  db: AsyncSession = Depends(get_read_db),
+                                  current_user: User = Depends(auth_service.get_current_user)):
     """
-    Retrieve contact by email.
+    Retrieve contacts by email.
 
     :param contact_email: The email to search for.
     :type contact_email: str
+    :param skip: The number of records to skip.
+    :type skip: int, optional
+    :param limit: The maximum number of records to return.
+    :type limit: int, optional
+    :param serializer: The serializer of the requested fields, see the ``fields`` parameter.
+    :type serializer: RowSerializer
     :param db: The database session dependency.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user dependency.
     :type current_user: User
-    :return: The contact found with the given email.
-    :rtype: ContactResponse
-    :raises HTTPException: If no contacts are found with the given email.
+    :return: The contacts that match the given email, best matches first.
+    :rtype: List[ContactResponse]
     """
-    contacts = await repository_notes.find_email(contact_email, current_user, db)
-    if  contacts is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contacts
+    contacts = await repository_notes.find_email(contact_email, skip, limit, current_user, db, serializer.fields)
+    return Response(serializer.dump_list(contacts), media_type="application/json")
 
-@router.get("/upcoming", response_model=ContactResponse|List[ContactResponse])
-async def upcoming_birthdays_contacts(skip: int = None, limit: int = None, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+@router.get("/upcoming", response_model=List[ContactResponse])
+async def upcoming_birthdays_contacts(days: int = Query(default=7, ge=1, le=366), skip: int = 0, limit: int = 100,
+                                      serializer: RowSerializer = Depends(contact_fields),
+                                      if_none_match: str | None = Header(default=None),
+                                      db: AsyncSession = Depends(get_read_db),
+                                      current_user: User = Depends(auth_service.get_current_user)):
     """
     Retrieve contacts with upcoming birthdays.
 
+    :param days: The number of days to look ahead, today included.
+    :type days: int, optional
     :param skip: The number of records to skip.
     :type skip: int, optional
     :param limit: The maximum number of records to return.
     :type limit: int, optional
+    :param serializer: The serializer of the requested fields, see the ``fields`` parameter.
+    :type serializer: RowSerializer
+    :param if_none_match: The ETag of the client's copy; if it is current, 304 is sent without reading the contacts.
+    :type if_none_match: str, optional
     :param db: The database session dependency.
-    :type db: Session
+    :type db: AsyncSession
     :param current_user: The current authenticated user dependency.
     :type current_user: User
-    :return: The contacts upcoming birthdays found.
-    :rtype: [List[ContactResponse]
-    :raises HTTPException: If no contacts are found.
+    :return: The contacts with upcoming birthdays, nearest birthday first.
+    :rtype: List[ContactResponse]
     """
-    contacts = await repository_notes.get_upcoming_birthdays(skip, limit, current_user, db)
-    if  contacts is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contacts
+    today = dt.date.today()
+
+    async def load():
+        return await repository_notes.get_upcoming_birthdays(skip, limit, current_user, db, days, today,
+                                                             serializer.fields), {}
+
+    return await contacts_cache.json_response(current_user.id, f"upcoming:{today}:{days}:{skip}:{limit}:"
+                                              f"{','.join(serializer.fields)}", load, serializer.dump_list,
+                                              if_none_match)
 
 @router.get("/", response_model=List[ContactResponse], description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def read_contacts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def read_contacts(skip: int = 0, limit: int = 100,
+                        sort: str = Query(default='id', pattern='^(id|name|created)$'), cursor: str | None = None,
+                        serializer: RowSerializer = Depends(contact_fields),
+                        if_none_match: str | None = Header(default=None), db: AsyncSession = Depends(get_read_db),
+                        current_user: User = Depends(auth_service.get_current_user)):
     """
     Retrieve a list of contacts.
 
+    A full page carries an ``X-Next-Cursor`` header; passing it back as ``cursor``
+    returns the next page without the cost of an offset.
+
     :param skip: The number of records to skip.
     :type skip: int, optional
     :param limit: The maximum number of records to return.
     :type limit: int, optional
+    :param sort: The sort order: ``id``, ``name`` (last, first name) or ``created``.
+    :type sort: str, optional
+    :param cursor: The ``X-Next-Cursor`` value of the previous page.
+    :type cursor: str, optional
+    :param serializer: The serializer of the requested fields, see the ``fields`` parameter.
+    :type serializer: RowSerializer
+    :param if_none_match: The ETag of the client's copy; if it is current, 304 is sent without reading the contacts.
+    :type if_none_match: str, optional
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :param current_user: The current authenticated user dependency.
     :type current_user: User, optional
     :return: A list of contacts.
     :rtype: List[ContactResponse]
+    :raises HTTPException: If the cursor is invalid or combined with skip.
     """
-    contacts = await repository_notes.get_contacts(skip, limit, current_user, db)
-    return contacts
+    after = None
+    if cursor is not None:
+        if skip:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use either skip or cursor")
+        try:
+            after = repository_notes.decode_cursor(cursor, sort)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    async def load():
+        contacts = await repository_notes.get_contacts(skip, limit, current_user, db, sort, after, serializer.fields)
+        headers = {}
+        if contacts and len(contacts) == limit:
+            headers["X-Next-Cursor"] = repository_notes.encode_cursor(contacts[-1], sort)
+        return contacts, headers
+
+    return await contacts_cache.json_response(current_user.id, f"list:{sort}:{skip}:{limit}:{cursor}:"
+                                              f"{','.join(serializer.fields)}", load, serializer.dump_list,
+                                              if_none_match)
+
+@router.get("/export", response_class=StreamingResponse, description='No more than 2 requests per minute',
+            dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def export_contacts(format: str = Query(default='ndjson', pattern='^(csv|ndjson)$'), gzip: bool = False,
+                          db: AsyncSession = Depends(get_read_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Export the whole address book of the current user as one streamed file.
+
+    :param format: The file format, ``ndjson`` or ``csv``.
+    :type format: str, optional
+    :param gzip: Whether to send the file gzip-compressed.
+    :type gzip: bool, optional
+    :param db: The database session dependency.
+    :type db: AsyncSession, optional
+    :param current_user: The current authenticated user dependency.
+    :type current_user: User, optional
+    :return: The contacts file, as an attachment.
+    :rtype: StreamingResponse
+    """
+    filename = f"contacts.{format}"
+    media_type = contact_files.MEDIA_TYPES[format]
+    body = contact_files.export_contacts(current_user, db, format)
+    if gzip:
+        filename, media_type, body = f"{filename}.gz", "application/gzip", contact_files.gzip_stream(body)
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 @router.get("/{contact_id}", response_model=ContactResponse)
-async def read_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def read_contact(contact_id: int, serializer: RowSerializer = Depends(contact_fields),
+                       if_none_match: str | None = Header(default=None), db: AsyncSession = Depends(get_read_db),
+                       current_user: User = Depends(auth_service.get_current_user)):
     """
     Retrieve a specific contact by ID.
 
     :param contact_id: The ID of the contact to retrieve.
     :type contact_id: int
+    :param serializer: The serializer of the requested fields, see the ``fields`` parameter.
+    :type serializer: RowSerializer
+    :param if_none_match: The ETag of the client's copy; if it is current, 304 is sent without reading the contacts.
+    :type if_none_match: str, optional
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :param current_user: The current authenticated user dependency.
     :type current_user: User, optional
     :return: The contact found with the given ID.
     :rtype: ContactResponse
     :raises HTTPException: If no contact is found with the given ID.
     """
-    contact = await repository_notes.get_contact(contact_id, current_user, db)
-    if  contact is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
-    return contact
+
+    async def load():
+        contact = await repository_notes.get_contact(contact_id, current_user, db, serializer.fields)
+        if  contact is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found")
+        return contact, {}
+
+    return await contacts_cache.json_response(current_user.id, f"contact:{contact_id}:{','.join(serializer.fields)}",
+                                              load, serializer.dump, if_none_match)
 
 
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED, description='No more than 3 requests per minute',
             dependencies=[Depends(RateLimiter(times=3, seconds=60))] )
-async def create_contact(body: ContactModel, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def create_contact(body: ContactModel, db: AsyncSession = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
     """
     Create a new contact.
 
     :param body: The contact data to create.
     :type body: ContactModel
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :param current_user: The current authenticated user dependency.
     :type current_user: User, optional
     :return: The created contact.
@@ -135,9 +265,93 @@ async def create_contact(body: ContactModel, db: Session = Depends(get_db), curr
     """
     return await repository_notes.create_contact(body, current_user,db)
 
+@router.post("/import", response_model=ContactImportResult, description='No more than 2 requests per minute',
+             dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+async def import_contacts(file: UploadFile = File(), format: str | None = Query(default=None, pattern='^(csv|ndjson)$'),
+                          db: AsyncSession = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Import contacts from a CSV file with a header row or an NDJSON file.
+
+    :param file: The uploaded file; its format is taken from the extension unless given.
+    :type file: UploadFile
+    :param format: The file format, ``csv`` or ``ndjson``.
+    :type format: str, optional
+    :param db: The database session dependency.
+    :type db: AsyncSession, optional
+    :param current_user: The current authenticated user dependency.
+    :type current_user: User, optional
+    :return: The number of imported and failed rows and the errors of the first failed rows.
+    :rtype: ContactImportResult
+    :raises HTTPException: If the file format cannot be determined, or the file is not UTF-8 text.
+    """
+    fmt = contact_files.file_format(file.filename, format)
+    if fmt is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown file format, use csv or ndjson")
+    try:
+        return await contact_files.import_contacts(file.file, fmt, current_user, db)
+    except contact_files.InvalidImportFile as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/batch", response_model=ContactBatchResult, description='No more than 10 requests per minute',
+             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def batch_contacts(body: ContactBatch, db: AsyncSession = Depends(get_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Create, update and delete contacts in one transaction.
+
+    :param body: The operations: ``create`` with ``contact``, ``update`` with ``id`` and ``contact``, ``delete`` with ``id``.
+    :type body: ContactBatch
+    :param db: The database session dependency.
+    :type db: AsyncSession, optional
+    :param current_user: The current authenticated user dependency.
+    :type current_user: User, optional
+    :return: The result of each operation: ``created``, ``updated``, ``deleted`` or ``not_found``.
+    :rtype: ContactBatchResult
+    :raises HTTPException: If the batch has more operations than allowed, or more than one operation on a contact.
+    """
+    if len(body.operations) > settings.contacts_batch_max:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"No more than {settings.contacts_batch_max} operations per batch")
+    repeated = body.repeated_ids()
+    if repeated:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"More than one operation on contacts {', '.join(map(str, repeated))}")
+    results = await repository_notes.apply_contact_batch(body.operations, current_user, db)
+    return {"results": results}
+
+@router.post("/lookup", response_model=ContactLookupResult, description='No more than 10 requests per minute',
+             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+async def lookup_contacts(body: ContactLookup, serializer: RowSerializer = Depends(contact_fields),
+                          db: AsyncSession = Depends(get_read_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    Retrieve several contacts by ID with one query.
+
+    :param body: The IDs of the contacts; repeated IDs are returned once.
+    :type body: ContactLookup
+    :param serializer: The serializer of the requested fields, see the ``fields`` parameter.
+    :type serializer: RowSerializer
+    :param db: The database session dependency.
+    :type db: AsyncSession, optional
+    :param current_user: The current authenticated user dependency.
+    :type current_user: User, optional
+    :return: The contacts found, in the order of the IDs, and the IDs of no contact of the user.
+    :rtype: ContactLookupResult
+    :raises HTTPException: If more IDs are asked for than allowed.
+    """
+    if len(body.ids) > settings.contacts_lookup_max:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"No more than {settings.contacts_lookup_max} ids per lookup")
+    ids = list(dict.fromkeys(body.ids))
+    contacts = await repository_notes.get_contacts_by_ids(ids, current_user, db, serializer.fields)
+    found = {contact.id for contact in contacts}
+    return Response(orjson.dumps({"contacts": [serializer.row(contact) for contact in contacts],
+                                  "missing": [contact_id for contact_id in ids if contact_id not in found]}),
+                    media_type="application/json")
+
 @router.put("/{contact_id}", response_model=ContactResponse, description='No more than 10 requests per minute',
             dependencies=[Depends(RateLimiter(times=10, seconds=60))])
-async def update_contact(body: ContactModel, contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def update_contact(body: ContactModel, contact_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
     """
     Update an existing contact.
 
@@ -146,7 +360,7 @@ async def update_contact(body: ContactModel, contact_id: int, db: Session = Depe
     :param contact_id: The ID of the contact to update.
     :type contact_id: int
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :param current_user: The current authenticated user dependency.
     :type current_user: User, optional
     :return: The updated contact.
@@ -159,14 +373,14 @@ async def update_contact(body: ContactModel, contact_id: int, db: Session = Depe
     return contact
 
 @router.delete("/{contact_id}", response_model=ContactResponse)
-async def remove_contact(contact_id: int, db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+async def remove_contact(contact_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
     """
     Delete a contact.
 
     :param contact_id: The ID of the contact to delete.
     :type contact_id: int
     :param db: The database session dependency.
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     :param current_user: The current authenticated user dependency.
     :type current_user: User, optional
     :return: The deleted contact.
@@ -1,7 +1,5 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from str.database.db import get_db
 from str.database.models import User
@@ -9,6 +7,8 @@ import str.repository.users as repository_users
 from str.services.auth import auth_service
 from str.conf.config import settings
 from str.schemas import UserDb
+from str.services.avatars import InvalidImage, save_avatar
+from str.services.storage import StorageError, UploadTooLarge, upload_chunks
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -28,28 +28,32 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 
 @router.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db)):
     """
     Update the avatar of the currently authenticated user.
 
+    The image is stored as square thumbnails of each of ``avatar_sizes``.
+
     :param file: The uploaded file containing the new avatar image.
     :type file: UploadFile
     :param current_user: The current authenticated user.
     :type current_user: User
     :param db: The database session dependency.
-    :type db: Session, optional
-    :return: The updated user with the new avatar URL.
+    :type db: AsyncSession, optional
+    :return: The updated user with the new avatar thumbnail URLs.
     :rtype: UserDb
+    :raises HTTPException: If the file is not a supported image or is larger than ``avatar_max_size``,
+        or the avatar storage is unavailable.
     """
-    cloudinary.config(
-        cloud_name=settings['cloudinary_name'],
-        api_key=settings['cloudinary_api_key'],
-        api_secret=settings['cloudinary_api_secret'],
-        secure=True
-    )
-
-    r = cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill', version=r.get('version'))
-    user = await repository_users.update_avatar(current_user.email, src_url, db)
+    if not (file.content_type or '').startswith('image/'):
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Avatar must be an image")
+    try:
+        avatar = await save_avatar(upload_chunks(file, settings.avatar_max_size))
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except InvalidImage as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Avatar storage is unavailable")
+    user = await repository_users.update_avatar(current_user.email, avatar, db)
     return user
@@ -1,7 +1,8 @@
 # схеми. валідація вхідних і вихідних  даних
+from collections import Counter
 from datetime import date, datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field, EmailStr, constr
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, EmailStr, constr, model_validator
 
 import re
 
@@ -21,6 +22,60 @@ class ContactResponse(ContactBase):
     class Config:
         from_attributes = True
 
+class ContactOperation(BaseModel):
+    op: Literal['create', 'update', 'delete']
+    id: Optional[int] = None
+    contact: Optional[ContactModel] = None
+
+    @model_validator(mode='after')
+    def check_operation(self):
+        if self.op != 'create' and self.id is None:
+            raise ValueError(f"{self.op} needs the id of the contact")
+        if self.op != 'delete' and self.contact is None:
+            raise ValueError(f"{self.op} needs the contact data")
+        return self
+
+
+class ContactBatch(BaseModel):
+    operations: List[ContactOperation] = Field(min_length=1)
+
+    def repeated_ids(self) -> List[int]:
+        """The ids of the contacts more than one update or delete of the batch is on."""
+        counts = Counter(operation.id for operation in self.operations if operation.op != 'create')
+        return sorted(contact_id for contact_id, count in counts.items() if count > 1)
+
+
+class ContactOperationResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[int]
+    status: str
+
+
+class ContactBatchResult(BaseModel):
+    results: List[ContactOperationResult]
+
+
+class ContactLookup(BaseModel):
+    ids: List[int] = Field(min_length=1)
+
+
+class ContactLookupResult(BaseModel):
+    contacts: List[ContactResponse]
+    missing: List[int]
+
+
+class ContactImportError(BaseModel):
+    row: int
+    error: str
+
+
+class ContactImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ContactImportError]
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
     email: str
@@ -32,7 +87,7 @@ class UserDb(BaseModel):
     username: str
     email: str
     created_at: datetime
-    avatar: str
+    avatar: Optional[Dict[str, str]] = None
 
     class Config:
         from_attributes = True
@@ -51,3 +106,22 @@ class TokenModel(BaseModel):
 class RequestEmail(BaseModel):
     email: EmailStr
 
+
+class UserCacheStats(BaseModel):
+    local_hits: int
+    redis_hits: int
+    misses: int
+    local_size: int
+
+
+class PoolStats(BaseModel):
+    pid: int
+    pool: str
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    wait_total: float
+    wait_max: float
+    wait_avg: float
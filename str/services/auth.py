@@ -1,12 +1,12 @@
 from typing import Optional
-import redis
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from str.database.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from str.database.db import get_read_db
+from str.services.cache import user_cache
+from str.services import passwords
 import str.repository.users as repository_users
 from str.conf.config import settings
 
@@ -17,15 +17,14 @@ class Auth:
     and user retrieval.
     """
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = passwords.pwd_context
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
 
-    def verify_password(self, plain_password, hashed_password):
+    async def verify_password(self, plain_password, hashed_password):
         """
-        Verify a plain password against a hashed password.
+        Verify a plain password against a hashed password, off the event loop.
 
         :param plain_password: The plain text password.
         :type plain_password: str
@@ -34,18 +33,33 @@ class Auth:
         :return: True if the password matches, False otherwise.
         :rtype: bool
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        verified, _ = await passwords.verify_password(plain_password, hashed_password)
+        return verified
 
-    def get_password_hash(self, password: str):
+    async def verify_and_update_password(self, plain_password, hashed_password):
         """
-        Hash a password.
+        Verify a plain password against a hashed password, off the event loop, and rehash
+        it if the hash uses an outdated scheme or cost.
+
+        :param plain_password: The plain text password.
+        :type plain_password: str
+        :param hashed_password: The hashed password.
+        :type hashed_password: str
+        :return: True if the password matches, and the new hash to store, or None if the hash is current.
+        :rtype: tuple[bool, str | None]
+        """
+        return await passwords.verify_password(plain_password, hashed_password)
+
+    async def get_password_hash(self, password: str):
+        """
+        Hash a password, off the event loop.
 
         :param password: The plain text password.
         :type password: str
         :return: The hashed password.
         :rtype: str
         """
-        return self.pwd_context.hash(password)
+        return await passwords.hash_password(password)
 
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -108,14 +122,21 @@ class Auth:
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def warm_up(self):
+        """Sign and verify a first token, so the JWT backend is loaded before the first login."""
+        token = await self.create_access_token({"sub": "warm-up"})
+        jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
         """
         Retrieve the current user based on the provided token.
 
+        The user is looked up in the user cache first, so most requests do not query the database.
+
         :param token: The OAuth2 token.
         :type token: str
         :param db: The database session dependency.
-        :type db: Session, optional
+        :type db: AsyncSession, optional
         :return: The current authenticated user.
         :rtype: User
         :raises HTTPException: If the credentials are invalid.
@@ -138,9 +159,13 @@ class Auth:
         except JWTError as e:
             raise credentials_exception
 
+        user = await user_cache.get(email)
+        if user is not None:
+            return user
         user = await repository_users.get_user_by_email(email, db)
         if user is None:
             raise credentials_exception
+        await user_cache.set(user)
         return user
     
 
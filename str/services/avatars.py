@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import logging
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List
+
+from libgravatar import Gravatar
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from str.conf.config import settings
+import str.repository.users as repository_users
+from str.services.storage import AvatarStorage, avatar_storage
+
+THUMBNAIL_FORMAT = ("WEBP", "webp", "image/webp")
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidImage(ValueError):
+    """Raised when an upload cannot be decoded as an image, or is too large to decode."""
+
+
+def make_thumbnails(data: bytes, sizes: List[int]) -> Dict[int, bytes]:
+    """
+    Decode an image once and encode square, center-cropped thumbnails of it.
+
+    :param data: The uploaded image.
+    :type data: bytes
+    :param sizes: The side lengths of the thumbnails, in pixels.
+    :type sizes: List[int]
+    :return: The encoded thumbnails by size.
+    :rtype: Dict[int, bytes]
+    :raises InvalidImage: If the data is not an image, or has more than ``avatar_max_pixels`` pixels.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.width * image.height > settings.avatar_max_pixels:
+            raise InvalidImage("Image is too large")
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise InvalidImage("File is not a supported image") from e
+    thumbnails = {}
+    for size in sorted(sizes, reverse=True):
+        # each thumbnail is reduced from the previous, larger one
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, THUMBNAIL_FORMAT[0], quality=settings.avatar_quality)
+        thumbnails[size] = out.getvalue()
+    return thumbnails
+
+
+async def save_avatar(chunks: AsyncIterator[bytes], storage: AvatarStorage = avatar_storage,
+                      sizes: List[int] | None = None) -> Dict[str, str]:
+    """
+    Store the thumbnails of an uploaded avatar under the hash of its content.
+
+    An image the storage knows was uploaded before, by anyone, is found by its hash and
+    neither decoded nor stored again; otherwise its thumbnails are stored without
+    replacing any already there. The largest thumbnail is stored last, so its presence
+    means the whole set is stored.
+
+    :param chunks: The content of the upload.
+    :type chunks: AsyncIterator[bytes]
+    :param storage: Where to store the thumbnails.
+    :type storage: AvatarStorage
+    :param sizes: The thumbnail sizes, ``avatar_sizes`` by default.
+    :type sizes: List[int] | None
+    :return: The URL of each thumbnail, by size.
+    :rtype: Dict[str, str]
+    :raises InvalidImage: If the upload is not a supported image.
+    :raises StorageError: If the thumbnails cannot be stored.
+    """
+    sizes = sizes or settings.avatar_sizes
+    data = b"".join([chunk async for chunk in chunks])
+    digest = hashlib.sha256(data).hexdigest()
+    names = {size: f"{digest}/{size}.{THUMBNAIL_FORMAT[1]}" for size in sorted(sizes)}
+    if not await storage.exists(names[max(sizes)]):
+        thumbnails = await run_in_threadpool(make_thumbnails, data, sizes)
+        for size, name in names.items():
+            await storage.put(name, thumbnails[size], THUMBNAIL_FORMAT[2])
+    return {str(size): storage.url(name) for size, name in names.items()}
+
+
+@lru_cache(maxsize=4096)
+def _gravatar(email: str) -> tuple:
+    g = Gravatar(email)
+    return tuple((str(size), g.get_image(size=size)) for size in settings.avatar_sizes)
+
+
+def gravatar_avatar(email: str) -> Dict[str, str]:
+    """
+    Build the Gravatar URL of each avatar size for an email, memoised per email.
+
+    :param email: The email of the user.
+    :type email: str
+    :return: The URL of each size.
+    :rtype: Dict[str, str]
+    """
+    return dict(_gravatar(email))
+
+
+async def resolve_gravatar(email: str, session_factory: async_sessionmaker):
+    """
+    Give a new user their Gravatar avatar; run after signup, outside the request.
+
+    :param email: The email of the user.
+    :type email: str
+    :param session_factory: Opens the session of the task, see ``get_session_factory``.
+    :type session_factory: async_sessionmaker
+    """
+    try:
+        async with session_factory() as db:
+            await repository_users.fill_avatar(email, gravatar_avatar(email), db)
+    except Exception:
+        logger.exception("Cannot set the Gravatar avatar of %s", email)
+
+
+async def backfill_gravatars(batch_size: int, session_factory: async_sessionmaker) -> int:
+    """
+    Give every user without an avatar their Gravatar avatar.
+
+    :param batch_size: The number of users updated per transaction.
+    :type batch_size: int
+    :param session_factory: Opens the session of the backfill.
+    :type session_factory: async_sessionmaker
+    :return: The number of avatars set.
+    :rtype: int
+    """
+    async with session_factory() as db:
+        return await repository_users.fill_missing_avatars(gravatar_avatar, batch_size, db)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fill in the Gravatar avatars of users who have no avatar.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    from str.database.db import SessionLocal
+    print(f"{asyncio.run(backfill_gravatars(args.batch_size, SessionLocal))} avatars filled in")
@@ -0,0 +1,312 @@
+import datetime as dt
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+import redis.asyncio as redis
+from fastapi import Response
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
+from redis.exceptions import RedisError
+
+from str.conf.config import settings
+from str.database.models import User
+
+_redis = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Get the Redis client shared by the caches of this worker, creating it on first use.
+
+    A failed command is retried once, immediately: a cache miss is cheaper than
+    waiting out the client's default backoff.
+
+    :return: The client of ``settings.redis_host``.
+    :rtype: redis.Redis
+    """
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0,
+                             socket_connect_timeout=1, socket_timeout=1, retry=Retry(NoBackoff(), 1))
+    return _redis
+
+
+async def close_redis():
+    """Close the connections of the shared Redis client; the next ``get_redis`` creates a new one."""
+    global _redis
+    if _redis is not None:
+        client, _redis = _redis, None
+        await client.aclose()
+
+
+class RedisCache:
+    """
+    Base of the Redis caches: Redis errors never fail a request, the cache is bypassed
+    for ``retry`` seconds instead.
+    """
+
+    def __init__(self, ttl: int, retry: float):
+        self.ttl = ttl
+        self.retry = retry
+        self.down_until = 0.0
+        self._redis = None
+
+    @property
+    def redis(self) -> redis.Redis:
+        return self._redis or get_redis()
+
+    def available(self) -> bool:
+        return self.ttl > 0 and time.monotonic() >= self.down_until
+
+    def failed(self):
+        self.down_until = time.monotonic() + self.retry
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Check an ``If-None-Match`` header against an ETag, with the weak comparison it calls for.
+
+    ``*`` is not matched: whether the resource exists is only known after the query.
+
+    :param if_none_match: The header, e.g. ``"abc", W/"def"``.
+    :type if_none_match: str | None
+    :param etag: The current ETag, quoted.
+    :type etag: str
+    :return: True if the client has the current representation.
+    :rtype: bool
+    """
+    if not if_none_match:
+        return False
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+class ContactsCache(RedisCache):
+    """
+    Redis cache of serialized contact responses, invalidated per user by a revision.
+
+    Every key embeds the current revision of the user's address book, and each write
+    replaces the revision, so one write makes all of the user's cached pages unreachable
+    without scanning keys; they expire after ``cache_ttl``. A cache hit is sent as stored,
+    without touching the database, the ORM or Pydantic.
+
+    The revision also makes the ETag of each response, so a client that already has the
+    current page is answered ``304 Not Modified`` before anything is read. The revision
+    itself expires after ``cache_ttl``: a write made while Redis was unreachable could not
+    replace it, and must not leave stale pages and ETags valid for longer than that.
+
+    A page is cached under the revision read before it is loaded, so it must not come
+    from a replica that has not caught up with the write that started the revision: the
+    writer's reads go to the primary for ``db_read_your_writes`` seconds, on every worker
+    (see ``ReplicaSet``).
+    """
+
+    @staticmethod
+    def revision_key(user_id: int) -> str:
+        return f"contacts:rev:{user_id}"
+
+    async def revision(self, user_id: int) -> str | None:
+        """
+        Get the revision of a user's address book, starting one if there is none yet.
+
+        :param user_id: The owner of the address book.
+        :type user_id: int
+        :return: The revision, or None if Redis is unavailable.
+        :rtype: str | None
+        """
+        if not self.available():
+            return None
+        key = self.revision_key(user_id)
+        try:
+            rev = await self.redis.get(key)
+            if rev is None:
+                await self.redis.set(key, time.time_ns(), nx=True, ex=self.ttl)
+                rev = await self.redis.get(key)
+        except (RedisError, OSError):
+            self.failed()
+            return None
+        return rev.decode()
+
+    async def bump(self, user_id: int):
+        """
+        Start a new revision of a user's address book after a write.
+
+        The revision is set to the current time rather than incremented, so a revision
+        key lost to eviction can never come back with a value already used.
+
+        :param user_id: The owner of the address book.
+        :type user_id: int
+        """
+        if not self.available():
+            return
+        try:
+            await self.redis.set(self.revision_key(user_id), time.time_ns(), ex=self.ttl)
+        except (RedisError, OSError):
+            self.failed()
+
+    async def get(self, key: str) -> dict | None:
+        try:
+            entry = await self.redis.hgetall(key)
+        except (RedisError, OSError):
+            self.failed()
+            return None
+        return entry or None
+
+    async def set(self, key: str, body: bytes, headers: dict):
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping={"body": body, **{f"h:{name}": value for name, value in headers.items()}})
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except (RedisError, OSError):
+            self.failed()
+
+    @staticmethod
+    def etag(user_id: int, rev: str, key: str) -> str:
+        return '"' + hashlib.blake2b(f"{user_id}:{rev}:{key}".encode(), digest_size=16).hexdigest() + '"'
+
+    async def json_response(self, user_id: int, key: str, load: Callable[[], Awaitable[tuple[Any, dict]]],
+                            dump: Callable[[Any], bytes], if_none_match: str | None = None) -> Response:
+        """
+        Answer a read with 304 if the client has it, from the cache, or load, serialize and cache it.
+
+        Without Redis the read is loaded and sent without an ETag.
+
+        :param user_id: The owner of the data.
+        :type user_id: int
+        :param key: The key of the read within the user's address book, e.g. ``contact:5``.
+        :type key: str
+        :param load: Loads the data and the response headers on a cache miss.
+        :type load: Callable[[], Awaitable[tuple[Any, dict]]]
+        :param dump: Serializes the data to JSON.
+        :type dump: Callable[[Any], bytes]
+        :param if_none_match: The ``If-None-Match`` header of the request.
+        :type if_none_match: str | None
+        :return: The JSON response, or an empty 304 response.
+        :rtype: Response
+        """
+        rev = await self.revision(user_id)
+        if rev is None:
+            data, headers = await load()
+            return Response(dump(data), media_type="application/json", headers=headers)
+        validators = {"ETag": self.etag(user_id, rev, key), "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, validators["ETag"]):
+            return Response(status_code=304, headers=validators)
+        cache_key = f"contacts:{user_id}:{rev}:{key}"
+        if entry := await self.get(cache_key):
+            headers = {name[2:].decode(): value.decode() for name, value in entry.items() if name.startswith(b"h:")}
+            return Response(entry[b"body"], media_type="application/json", headers={**headers, **validators})
+        data, headers = await load()
+        body = dump(data)
+        await self.set(cache_key, body, headers)
+        return Response(body, media_type="application/json", headers={**headers, **validators})
+
+
+# user columns kept in the cache; the password hash and refresh token never leave the database
+USER_FIELDS = ('id', 'username', 'email', 'created_at', 'avatar', 'confirmed')
+
+
+class UserCache(RedisCache):
+    """
+    Two-tier cache of authenticated users, keyed by email (the JWT ``sub`` claim).
+
+    The first tier is an LRU dict in the worker, with a short TTL since another worker
+    cannot invalidate it; the second tier is Redis, shared by all workers. A cached user
+    is rebuilt as a new, detached ``User`` on every hit, so requests never share one.
+    """
+
+    def __init__(self, ttl: int, local_ttl: float, size: int, retry: float):
+        super().__init__(ttl, retry)
+        self.local_ttl = local_ttl
+        self.size = size
+        self.local = OrderedDict()
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(email: str) -> str:
+        return f"user:{email}"
+
+    @staticmethod
+    def to_user(data: dict) -> User:
+        created_at = data["created_at"] and dt.datetime.fromisoformat(data["created_at"])
+        return User(**{**data, "created_at": created_at})
+
+    def remember(self, email: str, data: dict):
+        if self.local_ttl <= 0:
+            return
+        self.local[email] = (time.monotonic() + self.local_ttl, data)
+        self.local.move_to_end(email)
+        while len(self.local) > self.size:
+            self.local.popitem(last=False)
+
+    async def get(self, email: str) -> User | None:
+        """
+        Get a user from the worker tier, then from Redis.
+
+        :param email: The email of the user.
+        :type email: str
+        :return: A detached copy of the cached user, or None on a miss.
+        :rtype: User | None
+        """
+        entry = self.local.get(email)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.local.move_to_end(email)
+                self.stats["local_hits"] += 1
+                return self.to_user(entry[1])
+            del self.local[email]
+        data = None
+        if self.available():
+            try:
+                raw = await self.redis.get(self.key(email))
+                data = raw and json.loads(raw)
+            except (RedisError, OSError):
+                self.failed()
+        if not data:
+            self.stats["misses"] += 1
+            return None
+        self.stats["redis_hits"] += 1
+        self.remember(email, data)
+        return self.to_user(data)
+
+    async def set(self, user: User):
+        """
+        Cache a user loaded from the database in both tiers.
+
+        :param user: The user.
+        :type user: User
+        """
+        data = {field: getattr(user, field) for field in USER_FIELDS}
+        data["created_at"] = data["created_at"] and data["created_at"].isoformat()
+        self.remember(user.email, data)
+        if not self.available():
+            return
+        try:
+            await self.redis.set(self.key(user.email), json.dumps(data), ex=self.ttl)
+        except (RedisError, OSError):
+            self.failed()
+
+    async def invalidate(self, email: str):
+        """
+        Drop a changed user from both tiers.
+
+        :param email: The email of the user.
+        :type email: str
+        """
+        self.local.pop(email, None)
+        if not self.available():
+            return
+        try:
+            await self.redis.delete(self.key(email))
+        except (RedisError, OSError):
+            self.failed()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "local_size": len(self.local)}
+
+
+contacts_cache = ContactsCache(ttl=settings.cache_ttl, retry=settings.cache_retry)
+user_cache = UserCache(ttl=settings.user_cache_ttl, local_ttl=settings.user_cache_local_ttl,
+                       size=settings.user_cache_size, retry=settings.cache_retry)
@@ -0,0 +1,203 @@
+import zlib
+from typing import Callable, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from str.conf.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# media types worth compressing; images, archives and already compressed files are not
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "application/problem+json", "image/svg+xml")
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, wbits=31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level: int):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def build_encoders() -> dict[str, Callable[[], object]]:
+    """
+    Build the compressors of the encodings in ``compression_encodings`` that are installed.
+
+    Brotli and zstd need the ``brotli`` and ``zstandard`` packages (the ``compression`` extra);
+    gzip is always available.
+
+    :return: A factory of compressors by encoding, in order of preference.
+    :rtype: dict[str, Callable[[], object]]
+    """
+    factories = {"gzip": lambda: GzipCompressor(settings.compression_gzip_level)}
+    if brotli is not None:
+        factories["br"] = lambda: BrotliCompressor(settings.compression_brotli_quality)
+    if zstandard is not None:
+        factories["zstd"] = lambda: ZstdCompressor(settings.compression_zstd_level)
+    return {name: factories[name] for name in settings.compression_encodings if name in factories}
+
+
+def negotiate(accept_encoding: str, available: Sequence[str]) -> str | None:
+    """
+    Choose the encoding of a response from the ``Accept-Encoding`` header of the request.
+
+    :param accept_encoding: The header, e.g. ``gzip, br;q=0.9, *;q=0.1``.
+    :type accept_encoding: str
+    :param available: The encodings the server can use, preferred first.
+    :type available: Sequence[str]
+    :return: The encoding with the highest q-value, the server's preference breaking ties;
+        None if the client accepts none of them.
+    :rtype: str | None
+    """
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name.strip():
+            weights[name.strip().lower()] = weight
+    candidates = [(weights.get(name, weights.get("*", 0.0)), -index, name) for index, name in enumerate(available)]
+    if not candidates:
+        return None
+    weight, _, name = max(candidates)
+    return name if weight > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses responses with the best encoding the client accepts.
+
+    A response is left as it is if it is already encoded, is not of a compressible type,
+    has no body (204, 304) or asks for ``no-transform``. A response sent in one piece is
+    compressed only from ``minimum_size`` bytes, so small responses such as tokens are
+    not slowed down for nothing. A streamed response is compressed as it is produced,
+    flushing each chunk, so the client receives data as soon as it is ready.
+
+    A compressed response has a different body than the uncompressed one, so a strong
+    ETag is made weak, as the HTTP spec asks; ``If-None-Match`` still matches it.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024,
+                 encoders: dict[str, Callable[[], object]] | None = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encoders = build_encoders() if encoders is None else encoders
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), list(self.encoders))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressedSend(send, encoding, self.encoders[encoding], self.minimum_size))
+
+
+class CompressedSend:
+    """The ``send`` of one response, compressing its body if it qualifies."""
+
+    def __init__(self, send: Send, encoding: str, encoder: Callable[[], object], minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.encoder = encoder
+        self.minimum_size = minimum_size
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    def compressible(self) -> bool:
+        headers = Headers(raw=self.start["headers"])
+        return (self.start["status"] >= 200 and self.start["status"] not in (204, 304)
+                and "content-encoding" not in headers
+                and "no-transform" not in headers.get("cache-control", "")
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES))
+
+    def encode_headers(self, content_length: int | None):
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = {**message, "headers": list(message.get("headers", []))}
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.compressor is None:
+            if not self.compressible() or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            self.compressor = self.encoder()
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                self.encode_headers(len(body))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            self.encode_headers(None)
+            await self.send(self.start)
+        body = self.compressor.compress(body)
+        body += self.compressor.flush() if more_body else self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,215 @@
+import codecs
+import csv
+import datetime as dt
+import io
+import itertools
+import json
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from str.conf.config import settings
+from str.database.models import User
+from str.schemas import ContactModel
+import str.repository.notes as repository_notes
+
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_FIELDS = [column.key for column in repository_notes.EXPORT_COLUMNS]
+# key of the values of a CSV row beyond the fields of the header
+EXTRA_FIELDS = object()
+
+
+def file_format(filename: str | None, requested: str | None = None) -> str | None:
+    """
+    Resolve the format of a contacts file.
+
+    :param filename: The name of the uploaded file.
+    :type filename: str | None
+    :param requested: The format asked for explicitly, ``csv`` or ``ndjson``.
+    :type requested: str | None
+    :return: The format, or None if it cannot be told from the file name.
+    :rtype: str | None
+    """
+    return requested or FORMATS.get(Path(filename or '').suffix.lower())
+
+
+class InvalidImportFile(ValueError):
+    """Raised when a contacts file cannot be read at all, e.g. it is not UTF-8 text."""
+
+
+def decode_lines(file: BinaryIO, errors: list) -> Iterator[str]:
+    """
+    Decode the lines of a binary file as UTF-8, one at a time.
+
+    A line that is not UTF-8 is decoded with replacement characters and its error is
+    appended to ``errors``, so the reader can fail the row it belongs to and go on.
+
+    :param file: The binary file to read.
+    :type file: BinaryIO
+    :param errors: Receives the decoding errors.
+    :type errors: list
+    :return: The decoded lines.
+    :rtype: Iterator[str]
+    :raises InvalidImportFile: If the first line is not UTF-8; the file is then taken to be in another encoding.
+    """
+    for number, line in enumerate(file):
+        try:
+            yield line.decode('utf-8-sig' if number == 0 else 'utf-8')
+        except UnicodeDecodeError as e:
+            if number == 0:
+                raise InvalidImportFile("The file is not UTF-8 text") from e
+            errors.append(e)
+            yield line.decode('utf-8', errors='replace')
+
+
+def iter_rows(file: BinaryIO, fmt: str) -> Iterator[tuple[int, dict | Exception]]:
+    """
+    Read a CSV (with a header row) or NDJSON file one row at a time.
+
+    :param file: The binary file to read.
+    :type file: BinaryIO
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :return: Pairs of the row number and the row, or the error that made the row unreadable.
+    :rtype: Iterator[tuple[int, dict | Exception]]
+    :raises InvalidImportFile: If the file does not start with UTF-8 text.
+    """
+    errors = []
+    lines = decode_lines(file, errors)
+    if fmt == 'csv':
+        reader = csv.DictReader(lines, restkey=EXTRA_FIELDS)
+        for number in itertools.count(1):
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield number, ValueError(str(e))
+                continue
+            if errors:
+                errors.clear()
+                yield number, ValueError("Row is not UTF-8 text")
+            elif EXTRA_FIELDS in row:
+                yield number, ValueError(f"Row has {len(row[EXTRA_FIELDS])} more fields than the header")
+            else:
+                yield number, {key: value or None for key, value in row.items()}
+    for number, line in enumerate(lines, start=1):
+        if errors:
+            errors.clear()
+            yield number, ValueError("Row is not UTF-8 text")
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            yield number, row if isinstance(row, dict) else ValueError("Row is not a JSON object")
+        except ValueError as e:
+            yield number, e
+
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors())
+    return str(error)
+
+
+async def import_contacts(file: BinaryIO, fmt: str, user: User, db: AsyncSession) -> dict:
+    """
+    Import contacts from a CSV or NDJSON file in batches.
+
+    Rows are read and validated with ``ContactModel`` batch by batch, so memory use does
+    not depend on the file size. Invalid rows are reported and skipped; the valid rows of
+    each batch are inserted with one bulk insert and committed.
+
+    :param file: The binary file to import.
+    :type file: BinaryIO
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :param user: The user to create the contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: The number of imported and failed rows and the first errors.
+    :rtype: dict
+    :raises InvalidImportFile: If the file does not start with UTF-8 text; nothing is imported then.
+    """
+    rows = iter_rows(file, fmt)
+    result = {"imported": 0, "failed": 0, "errors": []}
+    while batch := await run_in_threadpool(list, itertools.islice(rows, settings.import_batch_size)):
+        contacts = []
+        for number, row in batch:
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                contacts.append(ContactModel(**{"info": None, **row}))
+            except ValueError as e:
+                result["failed"] += 1
+                if len(result["errors"]) < settings.import_max_errors:
+                    result["errors"].append({"row": number, "error": describe_error(e)})
+        result["imported"] += await repository_notes.create_contacts(contacts, user, db)
+    return result
+
+
+def export_row(row) -> dict:
+    """Turn an exported contact row into plain values, with the date of birth as an ISO date."""
+    born = row["date_of_birth"]
+    return {**row, "date_of_birth": (born.date() if isinstance(born, dt.datetime) else born).isoformat()}
+
+
+async def export_contacts(user: User, db: AsyncSession, fmt: str) -> AsyncIterator[bytes]:
+    """
+    Stream all contacts of a user as CSV (with a header row) or NDJSON.
+
+    Rows come from a server-side cursor and are encoded one batch at a time, so memory
+    use does not depend on the size of the address book. The session is closed when the
+    stream ends, since it outlives the request handler.
+
+    :param user: The user to export contacts for.
+    :type user: User
+    :param db: The database session.
+    :type db: AsyncSession
+    :param fmt: ``csv`` or ``ndjson``.
+    :type fmt: str
+    :return: The encoded file, one chunk per batch.
+    :rtype: AsyncIterator[bytes]
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    try:
+        if fmt == 'csv':
+            writer.writeheader()
+        async for rows in repository_notes.stream_contacts(user, db, settings.export_batch_size):
+            for row in rows:
+                if fmt == 'csv':
+                    writer.writerow(export_row(row))
+                else:
+                    buffer.write(json.dumps(export_row(row)) + "\n")
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+    finally:
+        await db.close()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Compress a stream of chunks into a gzip file as it is produced.
+
+    :param chunks: The stream to compress.
+    :type chunks: AsyncIterator[bytes]
+    :return: The gzip file, in chunks.
+    :rtype: AsyncIterator[bytes]
+    """
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,53 +1,220 @@
+import asyncio
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import EmailStr
 from str.conf.config import settings
 
 from str.services.auth import auth_service
 
-try:
-    conf = ConnectionConfig(
-        MAIL_USERNAME=settings.mail_username,
-        MAIL_PASSWORD=settings.mail_password,
-        MAIL_FROM=settings.mail_from,
-        MAIL_PORT=settings.mail_port,
-        MAIL_SERVER=settings.mail_server,
-        MAIL_FROM_NAME="Example email",
-        MAIL_STARTTLS=False,
-        MAIL_SSL_TLS=True,
-        USE_CREDENTIALS=True,
-        VALIDATE_CERTS=True,
-        TEMPLATE_FOLDER= Path("C:/programming.study/software/goit-software-12/str/services/templates"),
-                                    
-    )
-except Exception as e:
-    print(e)
+TEMPLATE_FOLDER = Path(__file__).parent / "templates"
+# templates are compiled once and kept by the environment's cache
+templates = Environment(loader=FileSystemLoader(TEMPLATE_FOLDER), autoescape=select_autoescape(), auto_reload=False)
+confirmation_template = templates.get_template("example.html")
+
+
+def smtp_options() -> dict:
+    """
+    Build the connection options of the SMTP server from the settings.
+
+    :return: Keyword arguments for ``aiosmtplib.SMTP``.
+    :rtype: dict
+    """
+    options = {
+        "hostname": settings.mail_server,
+        "port": settings.mail_port,
+        "use_tls": settings.mail_ssl_tls,
+        "start_tls": settings.mail_starttls,
+        "validate_certs": settings.mail_validate_certs,
+        "timeout": settings.mail_timeout,
+    }
+    if settings.mail_use_credentials:
+        options.update(username=settings.mail_username, password=settings.mail_password)
+    return options
+
+
+class Mailer:
+    """
+    Queued email delivery over persistent SMTP connections.
+
+    Messages wait in a bounded queue; each worker owns one SMTP connection, opened on
+    first use and kept open until it has been idle for ``idle_timeout`` seconds, so a
+    TLS handshake is paid once per connection rather than once per message. A worker
+    takes every waiting message, up to ``batch_size``, and sends them one after another
+    over its connection. A failed message is retried with exponential backoff over a
+    fresh connection; a permanent (5xx) rejection is not retried.
+
+    Workers start with the first queued message, on the running event loop.
+    """
+
+    def __init__(self, smtp_options: dict, pool_size: int, queue_size: int, batch_size: int, retries: int,
+                 backoff: float, idle_timeout: float):
+        self.smtp_options = smtp_options
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.loop = None
+        self.queue = None
+        self.workers = []
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "connections": 0}
+
+    def start(self, connect: bool = False):
+        """
+        Start the workers on the running event loop, replacing those that have stopped.
+
+        :param connect: Whether each worker opens its connection right away, rather than
+            with its first message; it is still closed after ``idle_timeout``.
+        :type connect: bool
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self.workers = []
+        self.workers = [worker for worker in self.workers if not worker.done()]
+        self.workers += [loop.create_task(self.work(connect)) for _ in range(self.pool_size - len(self.workers))]
+
+    async def stop(self, timeout: float | None = None):
+        """
+        Deliver the queued messages and stop the workers, closing their connections.
+
+        :param timeout: How long to wait for the queue to drain, in seconds.
+        :type timeout: float | None
+        """
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except TimeoutError:
+            pass
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def enqueue(self, message: EmailMessage):
+        """
+        Queue a message for delivery, waiting while the queue is full.
+
+        :param message: The message to send.
+        :type message: EmailMessage
+        """
+        self.start()
+        await self.queue.put(message)
+        self.stats["queued"] += 1
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(**self.smtp_options)
+        await smtp.connect()
+        self.stats["connections"] += 1
+        return smtp
+
+    @staticmethod
+    async def disconnect(smtp: aiosmtplib.SMTP | None):
+        if smtp is None or not smtp.is_connected:
+            return
+        try:
+            await smtp.quit()
+        except (aiosmtplib.SMTPException, OSError):
+            smtp.close()
+
+    async def deliver(self, smtp: aiosmtplib.SMTP | None, message: EmailMessage) -> aiosmtplib.SMTP | None:
+        """
+        Send one message, reconnecting and retrying with backoff on failure.
+
+        :param smtp: The worker's connection, or None if it has none open.
+        :type smtp: aiosmtplib.SMTP | None
+        :param message: The message to send.
+        :type message: EmailMessage
+        :return: The connection to keep for the next message.
+        :rtype: aiosmtplib.SMTP | None
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self.connect()
+                await smtp.send_message(message)
+                self.stats["sent"] += 1
+                return smtp
+            except aiosmtplib.SMTPResponseException as err:
+                if err.code >= 500:
+                    print(err)
+                    self.stats["failed"] += 1
+                    return smtp
+                error = err
+            except (aiosmtplib.SMTPException, OSError) as err:
+                error = err
+            await self.disconnect(smtp)
+            smtp = None
+            if attempt < self.retries:
+                self.stats["retried"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+        print(error)
+        self.stats["failed"] += 1
+        return None
+
+    async def work(self, connect: bool = False):
+        smtp = None
+        try:
+            if connect:
+                try:
+                    smtp = await self.connect()
+                except (aiosmtplib.SMTPException, OSError) as err:
+                    print(err)
+            while True:
+                try:
+                    message = await asyncio.wait_for(self.queue.get(), self.idle_timeout if smtp else None)
+                except TimeoutError:
+                    await self.disconnect(smtp)
+                    smtp = None
+                    continue
+                batch = [message]
+                while len(batch) < self.batch_size and not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                for message in batch:
+                    try:
+                        smtp = await self.deliver(smtp, message)
+                    except Exception as err:
+                        # an unexpected error fails the message, not the worker
+                        print(err)
+                        self.stats["failed"] += 1
+                        await self.disconnect(smtp)
+                        smtp = None
+                    finally:
+                        self.queue.task_done()
+        finally:
+            await self.disconnect(smtp)
+
+
+mailer = Mailer(smtp_options(), pool_size=settings.mail_pool_size, queue_size=settings.mail_queue_size,
+                batch_size=settings.mail_batch_size, retries=settings.mail_retries,
+                backoff=settings.mail_retry_backoff, idle_timeout=settings.mail_idle_timeout)
+
 
 async def send_email(email: EmailStr, username: str, host: str):
     """
     Send a confirmation email to the user.
 
+    The message is rendered and queued; it is delivered by the mailer's workers.
+
     :param email: The email address to send the confirmation to.
     :type email: EmailStr
     :param username: The username of the recipient.
     :type username: str
     :param host: The host URL to include in the email.
     :type host: str
-    :raises ConnectionErrors: If there is an error connecting to the email server.
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="example.html")
-    except ConnectionErrors as err:
-        print(err)
-
+    token_verification = auth_service.create_email_token({"sub": email})
+    message = EmailMessage()
+    message["Subject"] = "Confirm your email "
+    message["From"] = formataddr((settings.mail_from_name, settings.mail_from))
+    message["To"] = email
+    message.set_content(confirmation_template.render(host=host, username=username, token=token_verification),
+                        subtype="html")
+    await mailer.enqueue(message)
@@ -0,0 +1,223 @@
+import bisect
+import time
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A metric with labels, kept in this worker's memory."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        return self.header() + [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"
+                                for key, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = REQUEST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels):
+        # per label set: the count of each bucket (not cumulative), then the sum
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for key, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="' + str(bound) + '"'
+                lines.append(f"{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics of this worker, rendered in the Prometheus text format.
+
+    Besides its own metrics, the registry reads the counters the services already keep
+    (pool, caches, rate limiter, mailer) through collectors, when it is rendered.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Callable[[], Iterable[Metric]]):
+        """
+        Register a function that returns metrics built from a service's own counters.
+
+        :param collect: Called on every scrape.
+        :type collect: Callable[[], Iterable[Metric]]
+        """
+        self.collectors.append(collect)
+        return collect
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collect in self.collectors:
+            for metric in collect():
+                lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+request_duration = registry.add(Histogram("http_request_duration_seconds", "Time to answer a request.",
+                                          ("method", "route", "status")))
+requests_in_flight = registry.add(Gauge("http_requests_in_flight", "Requests being answered."))
+query_duration = registry.add(Histogram("db_query_duration_seconds", "Time to run a database statement.",
+                                        ("database", "statement"), QUERY_BUCKETS))
+requests_in_flight.values[()] = 0
+
+
+def stats_metrics(prefix: str, stats: dict, counters: Iterable[str] = (), help: str = "") -> list[Metric]:
+    """
+    Turn a dict of figures kept by a service into metrics.
+
+    :param prefix: The prefix of the metric names, e.g. ``rate_limit``.
+    :type prefix: str
+    :param stats: The figures by name.
+    :type stats: dict
+    :param counters: The figures that only grow; they are exported as ``<prefix>_<name>_total``.
+    :type counters: Iterable[str]
+    :param help: The help text of the metrics, prefixed to the figure name.
+    :type help: str
+    :return: A counter or gauge per numeric figure.
+    :rtype: list[Metric]
+    """
+    metrics = []
+    for name, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if name in counters:
+            metric = Counter(f"{prefix}_{name}_total", f"{help}{name}.")
+        else:
+            metric = Gauge(f"{prefix}_{name}", f"{help}{name}.")
+        metric.values[()] = value
+        metrics.append(metric)
+    return metrics
+
+
+def observe_queries(engine: AsyncEngine, database: str):
+    """
+    Time every statement run on an engine.
+
+    :param engine: The engine to instrument.
+    :type engine: AsyncEngine
+    :param database: The label of the engine, e.g. ``primary`` or ``replica``.
+    :type database: str
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        took = time.perf_counter() - conn.info["query_start"].pop()
+        query_duration.observe(took, database, statement.lstrip().split(None, 1)[0].upper() if statement else "")
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def failed_query(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the latency of each request by route, and the requests in flight.
+
+    Requests are labelled by the path template of their route, e.g. ``/api/contacts/{contact_id}``,
+    so the number of series does not grow with IDs; requests that match no route are
+    labelled ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            requests_in_flight.dec()
+            route = scope.get("route")
+            request_duration.observe(time.perf_counter() - start, scope["method"],
+                                     getattr(route, "path", "unmatched"), status)
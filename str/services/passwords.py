@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from str.conf.config import settings
+
+SCHEMES = ('bcrypt', 'argon2')
+
+
+def build_context(scheme: str = settings.password_scheme) -> CryptContext:
+    """
+    Build the password context from the settings.
+
+    New hashes use ``scheme`` with the configured cost; hashes of the other scheme, or
+    of the same scheme with other parameters, still verify and are reported for rehashing.
+
+    :param scheme: The scheme of new hashes, ``bcrypt`` or ``argon2`` (needs argon2-cffi).
+    :type scheme: str
+    :return: The password context.
+    :rtype: CryptContext
+    """
+    return CryptContext(schemes=[scheme, *[other for other in SCHEMES if other != scheme]],
+                        deprecated="auto",
+                        bcrypt__rounds=settings.bcrypt_rounds,
+                        argon2__time_cost=settings.argon2_time_cost,
+                        argon2__memory_cost=settings.argon2_memory_cost,
+                        argon2__parallelism=settings.argon2_parallelism)
+
+
+pwd_context = build_context()
+# bcrypt and argon2 release the GIL, so threads hash in parallel; the pool bounds how many
+# CPU cores hashing may take from the request workers
+executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+
+
+async def hash_password(password: str) -> str:
+    """
+    Hash a password in the hashing pool, off the event loop.
+
+    :param password: The plain text password.
+    :type password: str
+    :return: The hashed password.
+    :rtype: str
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> tuple[bool, str | None]:
+    """
+    Verify a password in the hashing pool, off the event loop.
+
+    :param password: The plain text password.
+    :type password: str
+    :param hashed: The stored hash.
+    :type hashed: str
+    :return: Whether the password matches, and a new hash if the stored one uses an outdated scheme or cost.
+    :rtype: tuple[bool, str | None]
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, pwd_context.verify_and_update, password, hashed)
+
+
+async def warm_up():
+    """
+    Hash once in every thread of the hashing pool, so the threads and the hash backend
+    are loaded before the first signup or login.
+    """
+    await asyncio.gather(*(hash_password("warm-up") for _ in range(settings.password_hash_workers)))
+
+
+def calibrate(scheme: str, target: float) -> dict:
+    """
+    Find the highest cost whose hash takes no longer than the target on this host.
+
+    bcrypt rounds are raised one at a time (each doubles the work); for argon2 the time
+    cost is raised with the configured memory cost and parallelism.
+
+    :param scheme: ``bcrypt`` or ``argon2``.
+    :type scheme: str
+    :param target: The target hashing time in seconds.
+    :type target: float
+    :return: The setting and value to use, and the measured time.
+    :rtype: dict
+    """
+    if scheme == 'bcrypt':
+        setting, costs = "bcrypt_rounds", range(4, 32)
+        options = lambda cost: {"bcrypt__rounds": cost}
+    else:
+        setting, costs = "argon2_time_cost", range(1, 100)
+        options = lambda cost: {"argon2__time_cost": cost, "argon2__memory_cost": settings.argon2_memory_cost,
+                                "argon2__parallelism": settings.argon2_parallelism}
+    best = None
+    for cost in costs:
+        context = CryptContext(schemes=[scheme], **options(cost))
+        start = time.perf_counter()
+        context.hash("calibration password")
+        seconds = time.perf_counter() - start
+        if seconds > target and best is not None:
+            break
+        best = {"setting": setting, "value": cost, "seconds": seconds}
+        if seconds > target:
+            break
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pick the password hashing cost for a target latency on this host.")
+    parser.add_argument("--scheme", choices=SCHEMES, default=settings.password_scheme)
+    parser.add_argument("--target-ms", type=float, default=250)
+    args = parser.parse_args()
+    result = calibrate(args.scheme, args.target_ms / 1000)
+    print(f"{result['setting'].upper()}={result['value']}  # {result['seconds'] * 1000:.0f} ms per hash")
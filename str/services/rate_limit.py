@@ -0,0 +1,124 @@
+import asyncio
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+from redis.exceptions import RedisError
+
+from str.conf.config import settings
+from str.services.cache import get_redis
+
+
+def client_ip(request: Request) -> str:
+    """The address of the client, taking the first ``X-Forwarded-For`` hop when behind a proxy."""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def token_subject(request: Request) -> str | None:
+    """The user of a request: the ``sub`` claim of its bearer token, if the token is valid."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]).get("sub")
+    except JWTError:
+        return None
+
+
+class RateLimiter:
+    """
+    Fixed-window rate limit, enforced from quota leased in slices from Redis.
+
+    The quota of a key for the current window lives in Redis. A worker takes a slice of
+    it (``rate_limit_lease_ratio`` of ``times``) with one ``INCRBY`` and spends it
+    locally, so most requests never reach Redis. Every slice is taken from the shared
+    count, so workers together never allow more than ``times`` requests per window;
+    tokens left in a worker's slice at the end of the window are lost, which may
+    reject a few requests early.
+
+    Requests are limited per user (the verified JWT ``sub``) and fall back to the
+    client address without a valid token; ``key='ip'`` always limits per address.
+
+    If Redis is unavailable, ``rate_limit_fail_open`` lets each worker apply the whole
+    quota on its own until the window ends; otherwise requests are refused with 503.
+    """
+
+    stats = {"allowed": 0, "limited": 0, "leases": 0, "errors": 0}
+    buckets = {}
+    # after a Redis error, leases are not attempted for ``cache_retry`` seconds
+    down_until = 0.0
+
+    def __init__(self, times: int, seconds: int, key: str = 'user'):
+        self.times = times
+        self.seconds = seconds
+        self.key = key
+        self.lease = max(1, math.ceil(times * settings.rate_limit_lease_ratio))
+
+    def identity(self, request: Request) -> str:
+        subject = token_subject(request) if self.key == 'user' else None
+        return f"user:{subject}" if subject else f"ip:{client_ip(request)}"
+
+    @classmethod
+    def prune(cls, now: float):
+        if len(cls.buckets) > settings.rate_limit_max_buckets:
+            cls.buckets = {key: bucket for key, bucket in cls.buckets.items() if bucket[0] > now}
+
+    async def take_lease(self, key: str) -> int:
+        """
+        Take a slice of the window's quota from Redis.
+
+        :param key: The Redis key of the quota.
+        :type key: str
+        :return: The number of requests granted to this worker, less than the lease when the quota runs out.
+        :rtype: int
+        """
+        if time.monotonic() < RateLimiter.down_until:
+            raise RedisError("Redis recently unavailable")
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.incrby(key, self.lease)
+            pipe.expire(key, self.seconds * 2)
+            taken, _ = await pipe.execute()
+        self.stats["leases"] += 1
+        return max(0, min(self.lease, self.times - (taken - self.lease)))
+
+    async def __call__(self, request: Request):
+        now = time.time()
+        window = int(now // self.seconds)
+        window_end = (window + 1) * self.seconds
+        endpoint = request.scope.get("endpoint")
+        name = f"{endpoint.__module__}.{endpoint.__qualname__}" if endpoint else request.url.path
+        key = f"rate:{name}:{request.method}:{self.identity(request)}:{window}"
+
+        # [window end, tokens left, whether the window's quota is used up, requests allowed,
+        #  lock held while a lease is taken]
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self.prune(now)
+            bucket = self.buckets[key] = [window_end, 0, False, 0, asyncio.Lock()]
+        if bucket[1] <= 0 and not bucket[2]:
+            async with bucket[4]:
+                # a concurrent request may have leased while this one waited for the lock
+                if bucket[1] <= 0 and not bucket[2]:
+                    try:
+                        granted = await self.take_lease(key)
+                        bucket[1] += granted
+                        bucket[2] = granted < self.lease
+                    except (RedisError, OSError):
+                        if time.monotonic() >= RateLimiter.down_until:
+                            RateLimiter.down_until = time.monotonic() + settings.cache_retry
+                        self.stats["errors"] += 1
+                        if not settings.rate_limit_fail_open:
+                            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                                detail="Rate limiter unavailable")
+                        bucket[1:3] = [self.times - bucket[3], True]
+        if bucket[1] <= 0:
+            self.stats["limited"] += 1
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(window_end - now))})
+        bucket[1] -= 1
+        bucket[3] += 1
+        self.stats["allowed"] += 1
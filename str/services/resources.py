@@ -0,0 +1,73 @@
+import inspect
+import time
+from typing import Any, Callable
+
+
+class Resources:
+    """
+    Registry of the shared resources of a worker: the pools and clients opened once and
+    closed when the application shuts down.
+
+    ``start`` warms the resources up in the order they were registered, so the first
+    requests after a deploy do not pay for opening connections or loading backends. A
+    warm-up that fails is reported and skipped; the resource is then set up on first use.
+    ``close`` closes the resources in reverse order, and a failure to close one does not
+    keep the others open.
+    """
+
+    def __init__(self):
+        self.resources = []
+        self.timings = {}
+
+    def register(self, name: str, warm_up: Callable[[], Any] | None = None, close: Callable[[], Any] | None = None):
+        """
+        Add a resource to the registry.
+
+        :param name: The name of the resource, used in reports.
+        :type name: str
+        :param warm_up: Called at startup, may be a coroutine function.
+        :type warm_up: Callable[[], Any] | None
+        :param close: Called at shutdown, may be a coroutine function.
+        :type close: Callable[[], Any] | None
+        """
+        self.resources.append((name, warm_up, close))
+
+    @staticmethod
+    async def call(action: Callable[[], Any]):
+        result = action()
+        if inspect.isawaitable(result):
+            await result
+
+    async def start(self, warm_up: bool = True) -> dict:
+        """
+        Warm up every resource.
+
+        :param warm_up: Whether to warm up; if False the resources are set up on first use.
+        :type warm_up: bool
+        :return: The seconds each warm-up took, or None for the ones that failed.
+        :rtype: dict
+        """
+        self.timings = {}
+        if not warm_up:
+            return self.timings
+        for name, action, _ in self.resources:
+            if action is None:
+                continue
+            start = time.perf_counter()
+            try:
+                await self.call(action)
+                self.timings[name] = time.perf_counter() - start
+            except Exception as e:
+                print(f"{name} warm-up failed: {e!r}")
+                self.timings[name] = None
+        return self.timings
+
+    async def close(self):
+        """Close every resource, the last registered first."""
+        for name, _, action in reversed(self.resources):
+            if action is None:
+                continue
+            try:
+                await self.call(action)
+            except Exception as e:
+                print(f"{name} close failed: {e!r}")
@@ -0,0 +1,100 @@
+import datetime as dt
+from functools import lru_cache
+from typing import Any, Callable, Iterable
+
+import orjson
+from pydantic import BaseModel, create_model
+
+
+def to_date(value):
+    return value.date() if isinstance(value, dt.datetime) else value
+
+
+# conversions from column values to the type of the response field, by field annotation;
+# e.g. a date of birth is a DateTime column but a ``date`` field
+CONVERTERS: dict[Any, Callable[[Any], Any]] = {dt.date: to_date}
+
+
+class RowSerializer:
+    """
+    JSON serializer of the ORM rows of our own queries, for a response model.
+
+    Rows read from our database were validated when they were written, so they are not
+    validated again: the fields of the response model are read from each row, converted
+    where the column type differs from the field type, and encoded with orjson. This
+    skips the Pydantic validation FastAPI runs on every returned object, which dominates
+    the cost of a list response (``python tests/benchmark_serialization.py``).
+
+    Only fields with plain types are supported; data from outside our database still
+    goes through the response model.
+    """
+
+    def __init__(self, model: type[BaseModel]):
+        self.fields = tuple(model.model_fields)
+        self.converters = {name: CONVERTERS[field.annotation] for name, field in model.model_fields.items()
+                           if field.annotation in CONVERTERS}
+
+    def row(self, obj) -> dict:
+        data = {name: getattr(obj, name) for name in self.fields}
+        for name, convert in self.converters.items():
+            data[name] = convert(data[name])
+        return data
+
+    def dump(self, obj) -> bytes:
+        """
+        Serialize one row.
+
+        :param obj: The ORM object.
+        :return: The JSON of the response model.
+        :rtype: bytes
+        """
+        return orjson.dumps(self.row(obj))
+
+    def dump_list(self, rows: Iterable) -> bytes:
+        """
+        Serialize rows as a JSON array.
+
+        :param rows: The ORM objects.
+        :type rows: Iterable
+        :return: The JSON array of the response model.
+        :rtype: bytes
+        """
+        return orjson.dumps([self.row(obj) for obj in rows])
+
+
+def parse_fields(model: type[BaseModel], fields: str) -> tuple[str, ...]:
+    """
+    Parse a sparse fieldset, e.g. ``id,first_name,email``.
+
+    :param model: The response model the fields are chosen from.
+    :type model: type[BaseModel]
+    :param fields: The comma-separated field names.
+    :type fields: str
+    :return: The fields, in the order of the model, so equal sets give equal tuples.
+    :rtype: tuple[str, ...]
+    :raises ValueError: If no field is given, or a field is not in the model.
+    """
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    if not names:
+        raise ValueError("No fields given")
+    unknown = names - set(model.model_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in model.model_fields if name in names)
+
+
+@lru_cache(maxsize=256)
+def sparse_serializer(model: type[BaseModel], fields: tuple[str, ...]) -> RowSerializer:
+    """
+    Build, once per fieldset, the serializer of a response model restricted to some fields.
+
+    :param model: The full response model.
+    :type model: type[BaseModel]
+    :param fields: The fields to keep, as returned by :func:`parse_fields`.
+    :type fields: tuple[str, ...]
+    :return: The serializer of a model with only these fields.
+    :rtype: RowSerializer
+    """
+    sparse = create_model(f"{model.__name__}[{','.join(fields)}]",
+                          **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in fields})
+    return RowSerializer(sparse)
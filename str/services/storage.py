@@ -0,0 +1,191 @@
+import io
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator
+
+import cloudinary
+import cloudinary.exceptions
+import cloudinary.uploader
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from str.conf.config import settings
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload grows past its size cap."""
+
+
+class StorageError(Exception):
+    """Raised when the avatar storage cannot be reached or refuses to store an image."""
+
+
+async def upload_chunks(file: UploadFile, max_size: int, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+    """
+    Read an upload in chunks, stopping as soon as it grows past the size cap.
+
+    :param file: The uploaded file.
+    :type file: UploadFile
+    :param max_size: The largest accepted size in bytes.
+    :type max_size: int
+    :param chunk_size: The size of the chunks, ``upload_chunk_size`` by default.
+    :type chunk_size: int | None
+    :return: The content of the file, chunk by chunk.
+    :rtype: AsyncIterator[bytes]
+    :raises UploadTooLarge: If the file is larger than ``max_size``.
+    """
+    if file.size is not None and file.size > max_size:
+        raise UploadTooLarge(f"File is larger than {max_size} bytes")
+    size = 0
+    while chunk := await file.read(chunk_size or settings.upload_chunk_size):
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLarge(f"File is larger than {max_size} bytes")
+        yield chunk
+
+
+class AvatarStorage(ABC):
+    """
+    Where avatar images are stored and served from.
+
+    Images are stored under content-addressed names, so a name always holds the same
+    bytes and is never overwritten with other content.
+    """
+
+    @abstractmethod
+    async def exists(self, name: str) -> bool:
+        """
+        Check whether an image is stored, if the storage can tell cheaply.
+
+        :param name: The name of the image, e.g. ``<sha256>/64.webp``.
+        :type name: str
+        :return: True if the image is known to be stored; False may also mean unknown.
+        :rtype: bool
+        """
+
+    @abstractmethod
+    async def put(self, name: str, data: bytes, content_type: str):
+        """
+        Store an image; an image already stored under the name is kept as it is.
+
+        :param name: The name of the image.
+        :type name: str
+        :param data: The encoded image.
+        :type data: bytes
+        :param content_type: The media type of the image.
+        :type content_type: str
+        :raises StorageError: If the image cannot be stored.
+        """
+
+    @abstractmethod
+    def url(self, name: str) -> str:
+        """
+        Build the URL an image is served from.
+
+        :param name: The name of the image.
+        :type name: str
+        :return: The URL.
+        :rtype: str
+        """
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Avatars kept on the local filesystem, for tests and on-prem deployments.
+
+    Files are written to a temporary file off the event loop and moved into place when
+    complete, so a name never holds a partial image. They are served under
+    ``base_url`` (see ``main.py``).
+    """
+
+    def __init__(self, root: Path, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def path(self, name: str) -> Path:
+        return self.root / "avatars" / name
+
+    async def exists(self, name: str) -> bool:
+        return await run_in_threadpool(self.path(name).exists)
+
+    @staticmethod
+    def write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    async def put(self, name: str, data: bytes, content_type: str):
+        try:
+            await run_in_threadpool(self.write, self.path(name), data)
+        except OSError as e:
+            raise StorageError(f"Cannot store {name}: {e}") from e
+
+    def url(self, name: str) -> str:
+        return f"{self.base_url}/avatars/{name}"
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    Avatars kept on Cloudinary, as plain image storage: thumbnails are made locally.
+
+    The SDK is configured once; its uploader keeps one module-level keep-alive HTTP
+    pool, which every upload reuses. Calls run in the thread pool, since the SDK is
+    blocking.
+
+    Whether an image is stored is not asked of Cloudinary: that takes the Admin API,
+    which is rate limited. Images are uploaded with ``overwrite=False`` instead, so an
+    image uploaded before is kept, and the last ``known`` names this worker stored are
+    remembered, so a repeated upload is not processed again.
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = 'NotesApp', known: int = 4096):
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.folder = folder
+        self.known = OrderedDict()
+        self.known_size = known
+
+    def public_id(self, name: str) -> str:
+        return f"{self.folder}/{Path(name).with_suffix('').as_posix()}"
+
+    async def exists(self, name: str) -> bool:
+        if name not in self.known:
+            return False
+        self.known.move_to_end(name)
+        return True
+
+    async def put(self, name: str, data: bytes, content_type: str):
+        try:
+            await run_in_threadpool(cloudinary.uploader.upload, io.BytesIO(data), public_id=self.public_id(name),
+                                    overwrite=False)
+        except (cloudinary.exceptions.Error, OSError) as e:
+            raise StorageError(f"Cannot store {name}: {e}") from e
+        self.known[name] = True
+        if len(self.known) > self.known_size:
+            self.known.popitem(last=False)
+
+    def url(self, name: str) -> str:
+        return cloudinary.CloudinaryImage(self.public_id(name)).build_url(format=Path(name).suffix.lstrip('.'))
+
+
+def build_avatar_storage() -> AvatarStorage:
+    """
+    Build the avatar storage chosen by ``avatar_storage``: ``cloudinary`` or ``local``.
+
+    :return: The storage backend.
+    :rtype: AvatarStorage
+    """
+    if settings.avatar_storage == 'local':
+        return LocalStorage(Path(settings.media_root), settings.media_url)
+    return CloudinaryStorage(settings.cloudinary_name, settings.cloudinary_api_key, settings.cloudinary_api_secret)
+
+
+avatar_storage = build_avatar_storage()
@@ -0,0 +1,52 @@
+"""
+Compare the serialization of contact lists: FastAPI's default path (validate against the
+response model, then ``json.dumps``), a compiled ``TypeAdapter`` and ``RowSerializer``.
+
+Run with ``python tests/benchmark_serialization.py``.
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import TypeAdapter
+
+from str.database.models import Contact
+from str.schemas import ContactResponse
+from str.services.serializers import RowSerializer
+
+CONTACT_LIST = TypeAdapter(List[ContactResponse])
+CONTACT = RowSerializer(ContactResponse)
+
+
+def contacts(count: int) -> list:
+    return [Contact(id=number, first_name="Jon", last_name=f"Snow{number}", email=f"jon{number}@example.com",
+                    phone_number="+380501234567", date_of_birth=datetime(1990, 1, 2), info="Knows nothing",
+                    created_at=datetime(2024, 7, 1, 12, 30), user_id=1) for number in range(count)]
+
+
+def fastapi_default(rows) -> bytes:
+    data = CONTACT_LIST.validate_python(rows, from_attributes=True)
+    return json.dumps(CONTACT_LIST.dump_python(data, mode="json")).encode()
+
+
+def type_adapter(rows) -> bytes:
+    return CONTACT_LIST.dump_json(CONTACT_LIST.validate_python(rows, from_attributes=True))
+
+
+def row_serializer(rows) -> bytes:
+    return CONTACT.dump_list(rows)
+
+
+if __name__ == '__main__':
+    print(f"{'contacts':>8} {'fastapi':>12} {'adapter':>12} {'rows':>12} {'speedup':>8}")
+    for count in (100, 1000, 10000):
+        rows = contacts(count)
+        number = max(1, 2000 // count)
+        times = [min(timeit.repeat(lambda: serialize(rows), number=number, repeat=5)) / number
+                 for serialize in (fastapi_default, type_adapter, row_serializer)]
+        print(f"{count:>8} " + " ".join(f"{took * 1000:>9.2f} ms" for took in times) + f" {times[0] / times[2]:>7.1f}x")
@@ -1,15 +1,17 @@
 
+import asyncio
+from datetime import date
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from contextlib import asynccontextmanager
 from main import app
-from str.database.models import Base
-from str.database.db import get_db
-from fastapi_limiter import FastAPILimiter
-
-from redis import asyncio as aioredis
+from str.database.models import Base, Contact, User
+from str.database.db import get_db, get_read_db, get_session_factory
 from unittest.mock import patch
 
 import sys
@@ -27,13 +29,11 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-@pytest.fixture(scope="module")
-async def redis_limiter():
-    redis = aioredis.from_url("redis://localhost", encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(redis)
-    yield redis
-    await redis.close()
-
+# the app runs on the async engine; TestClient starts a new event loop per request,
+# so connections must not be pooled across loops
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession,
+                                              autoflush=False, expire_on_commit=False)
 
 @pytest.fixture(scope="module")
 def session():
@@ -49,17 +49,49 @@ def session():
         db.close()
 
 
+@pytest.fixture(scope="module")
+def async_session_local(session):
+    # async sessions on the freshly created test database, for repository-level tests
+    return TestingAsyncSessionLocal
+
+
+@pytest.fixture(scope="module")
+def add_user(session):
+    # creates a user with its contacts; contacts are Contact fields, with a default phone and birth date.
+    # Returns a User with only its id, enough for repository calls
+    def add(username: str, contacts=()) -> User:
+        user = User(username=username, email=f'{username}@example.com', password='secret')
+        session.add(user)
+        session.commit()
+        session.add_all([Contact(**{"phone_number": '0120104000', "date_of_birth": date(2000, 1, 1),
+                                    **contact, "user_id": user.id}) for contact in contacts])
+        session.commit()
+        return User(id=user.id)
+    return add
+
+
+@pytest.fixture(scope="module")
+def run_db(async_session_local):
+    # runs call(db) on a new async session of the test database, from a synchronous test
+    def run(call):
+        async def run_call():
+            async with async_session_local() as db:
+                return await call(db)
+        return asyncio.run(run_call())
+    return run
+
+
 @pytest.fixture(scope="module")
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
 
     yield TestClient(app)
 
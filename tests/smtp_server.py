@@ -0,0 +1,61 @@
+import asyncio
+from email import message_from_bytes
+
+
+class LocalSMTPServer:
+    """
+    A minimal in-process SMTP server for tests: accepts every message and keeps it.
+
+    ``drop_connections`` makes the server hang up on that many connections right after
+    the greeting, to exercise reconnects.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.drop_connections = 0
+        self.server = None
+        self.port = None
+
+    async def start(self) -> "LocalSMTPServer":
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def options(self) -> dict:
+        return {"hostname": '127.0.0.1', "port": self.port, "use_tls": False, "start_tls": False, "timeout": 5}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        writer.write(b"220 localhost ESMTP\r\n")
+        if self.drop_connections:
+            self.drop_connections -= 1
+            writer.close()
+            return
+        while line := await reader.readline():
+            command = line.decode().strip().upper()
+            if command.startswith("EHLO"):
+                writer.write(b"250-localhost\r\n250 8BITMIME\r\n")
+            elif command.startswith("DATA"):
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = bytearray()
+                while (line := await reader.readline()) != b".\r\n":
+                    data += line[1:] if line.startswith(b"..") else line
+                self.messages.append(message_from_bytes(bytes(data)))
+                writer.write(b"250 OK\r\n")
+            elif command.startswith("QUIT"):
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            elif command.startswith(("HELO", "MAIL", "RCPT", "RSET", "NOOP")):
+                writer.write(b"250 OK\r\n")
+            else:
+                writer.write(b"502 Command not implemented\r\n")
+            await writer.drain()
+        writer.close()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, update
+
+from str.database.models import User
+from str.repository.users import fill_avatar, fill_missing_avatars
+from str.services.avatars import gravatar_avatar, resolve_gravatar
+
+
+def avatar(email: str) -> dict:
+    return {"64": f"https://avatars.example.com/{email}/64"}
+
+
+@pytest.fixture(scope="module")
+def users(session):
+    session.add_all([User(username=f'user{n}', email=f'user{n}@example.com', password='secret') for n in range(5)] +
+                    [User(username='uploader', email='uploader@example.com', password='secret',
+                          avatar={"64": "/media/avatars/abc/64.webp"})])
+    session.commit()
+
+
+def avatars(session) -> dict:
+    session.expire_all()
+    return dict(session.execute(select(User.email, User.avatar)).all())
+
+
+def test_new_users_have_no_avatar(session, users):
+    assert avatars(session)['user0@example.com'] is None
+
+
+def test_fill_avatar_keeps_an_uploaded_avatar(run_db, session, users):
+    async def fill(db):
+        return (await fill_avatar('user0@example.com', avatar('user0'), db),
+                await fill_avatar('uploader@example.com', avatar('uploader'), db))
+
+    assert run_db(fill) == (True, False)
+    assert avatars(session)['user0@example.com'] == avatar('user0')
+    assert avatars(session)['uploader@example.com'] == {"64": "/media/avatars/abc/64.webp"}
+
+
+def test_backfill_fills_every_missing_avatar_in_batches(run_db, session, users):
+    def backfill(db):
+        return fill_missing_avatars(lambda email: avatar(email.split('@')[0]), 2, db)
+
+    assert run_db(backfill) == 4
+    assert all(value is not None for value in avatars(session).values())
+    assert avatars(session)['user4@example.com'] == avatar('user4')
+    assert run_db(backfill) == 0
+
+
+def test_backfill_counts_only_the_avatars_it_set(run_db, session, users):
+    session.add_all([User(username=f'late{n}', email=f'late{n}@example.com', password='secret') for n in range(2)])
+    session.commit()
+
+    def resolve(email):
+        if email == 'late0@example.com':
+            # another process sets late1's avatar while the batch is being written
+            session.execute(update(User).filter_by(email='late1@example.com').values(avatar=avatar('elsewhere')))
+            session.commit()
+        return avatar(email.split('@')[0])
+
+    assert run_db(lambda db: fill_missing_avatars(resolve, 2, db)) == 1
+    assert avatars(session)['late1@example.com'] == avatar('elsewhere')
+
+
+def test_gravatar_has_a_url_per_size():
+    urls = gravatar_avatar('user0@example.com')
+    assert list(urls) == ['64', '128', '250']
+    assert urls['64'].startswith('https://www.gravatar.com/avatar/')
+    assert gravatar_avatar('user0@example.com') is not urls
+
+
+def test_resolve_gravatar_uses_the_given_sessions(async_session_local, session, users, caplog):
+    session.add(User(username='newcomer', email='newcomer@example.com', password='secret'))
+    session.commit()
+    asyncio.run(resolve_gravatar('newcomer@example.com', async_session_local))
+    assert avatars(session)['newcomer@example.com'] == gravatar_avatar('newcomer@example.com')
+
+    def broken():
+        raise ConnectionError("database is down")
+
+    asyncio.run(resolve_gravatar('newcomer@example.com', broken))
+    assert "Cannot set the Gravatar avatar of newcomer@example.com" in caplog.text
@@ -0,0 +1,130 @@
+import io
+import threading
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+import cloudinary.exceptions
+from fastapi import UploadFile
+from PIL import Image
+
+from str.services.avatars import InvalidImage, make_thumbnails, save_avatar
+from str.services.storage import CloudinaryStorage, LocalStorage, StorageError, UploadTooLarge, upload_chunks
+
+
+def upload(data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename="avatar.png")
+
+
+def png(width: int, height: int, color=(200, 30, 30)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+class TestUploadChunks(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reads_in_chunks(self):
+        chunks = [chunk async for chunk in upload_chunks(upload(b"x" * 10), max_size=10, chunk_size=4)]
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+
+    async def test_stops_past_the_cap(self):
+        with self.assertRaises(UploadTooLarge):
+            await collect(upload_chunks(upload(b"x" * 11), max_size=10, chunk_size=4))
+
+
+class TestThumbnails(unittest.TestCase):
+
+    def test_square_thumbnails_of_each_size(self):
+        thumbnails = make_thumbnails(png(400, 300), [64, 128, 250])
+        self.assertEqual({size: Image.open(io.BytesIO(data)).size for size, data in thumbnails.items()},
+                         {64: (64, 64), 128: (128, 128), 250: (250, 250)})
+        self.assertEqual(Image.open(io.BytesIO(thumbnails[64])).format, "WEBP")
+
+    def test_not_an_image(self):
+        with self.assertRaises(InvalidImage):
+            make_thumbnails(b"not an image", [64])
+
+    def test_too_many_pixels(self):
+        with patch('str.services.avatars.settings.avatar_max_pixels', 100):
+            with self.assertRaises(InvalidImage):
+                make_thumbnails(png(20, 20), [64])
+
+
+class TestLocalAvatars(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.dir = TemporaryDirectory()
+        self.root = Path(self.dir.name)
+        self.storage = LocalStorage(self.root, "/media/")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    async def save(self, data: bytes) -> dict:
+        return await save_avatar(upload_chunks(upload(data), max_size=10 ** 6), self.storage, [64, 128, 250])
+
+    async def test_stores_thumbnails_under_the_content_hash(self):
+        avatar = await self.save(png(300, 300))
+        self.assertEqual(list(avatar), ["64", "128", "250"])
+        digest = avatar["64"].split("/")[-2]
+        self.assertEqual(avatar["64"], f"/media/avatars/{digest}/64.webp")
+        self.assertEqual(sorted(path.name for path in (self.root / "avatars" / digest).iterdir()),
+                         ["128.webp", "250.webp", "64.webp"])
+
+    async def test_same_image_is_not_processed_again(self):
+        first = await self.save(png(300, 300))
+        with patch('str.services.avatars.make_thumbnails') as make:
+            second = await self.save(png(300, 300))
+        make.assert_not_called()
+        self.assertEqual(first, second)
+
+    async def test_other_image_gets_other_urls(self):
+        first = await self.save(png(300, 300))
+        second = await self.save(png(300, 300, color=(0, 0, 255)))
+        self.assertNotEqual(first["64"], second["64"])
+        self.assertEqual(len(list((self.root / "avatars").iterdir())), 2)
+
+
+class TestCloudinaryStorage(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.storage = CloudinaryStorage("cloud", "key", "secret")
+
+    async def test_put_runs_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        calls = []
+
+        def fake_upload(file, **options):
+            calls.append((threading.get_ident(), file.read(), options))
+            return {"version": 7}
+
+        with patch('cloudinary.uploader.upload', side_effect=fake_upload):
+            await self.storage.put("abc/64.webp", b"image", "image/webp")
+        thread, data, options = calls[0]
+        self.assertNotEqual(thread, loop_thread)
+        self.assertEqual(data, b"image")
+        self.assertEqual(options, {"public_id": "NotesApp/abc/64", "overwrite": False})
+        self.assertTrue(self.storage.url("abc/64.webp").endswith("/NotesApp/abc/64.webp"))
+
+    async def test_remembers_what_it_stored(self):
+        with patch('cloudinary.uploader.upload', return_value={"existing": True}) as upload_call:
+            self.assertFalse(await self.storage.exists("abc/250.webp"))
+            await self.storage.put("abc/250.webp", b"image", "image/webp")
+            self.assertTrue(await self.storage.exists("abc/250.webp"))
+        upload_call.assert_called_once()
+
+    async def test_upload_errors_raise_storage_error(self):
+        for error in (cloudinary.exceptions.RateLimited("slow down"), cloudinary.exceptions.Error("boom")):
+            with patch('cloudinary.uploader.upload', side_effect=error):
+                with self.assertRaises(StorageError):
+                    await self.storage.put("abc/64.webp", b"image", "image/webp")
+        self.assertFalse(await self.storage.exists("abc/64.webp"))
+
+if __name__ == '__main__':
+    unittest.main()
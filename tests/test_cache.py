@@ -0,0 +1,191 @@
+import asyncio
+import json
+import unittest
+from datetime import date, datetime
+
+from redis.exceptions import ConnectionError
+
+from str.routes.notes import CONTACT
+from str.database.models import Contact, User
+from str.services.cache import ContactsCache, UserCache, etag_matches
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def hset(self, key, mapping):
+        self.commands.append((key, mapping))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        for key, mapping in self.commands:
+            self.redis.data[key] = {name.encode(): value if isinstance(value, bytes) else value.encode()
+                                    for name, value in mapping.items()}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if not (nx and key in self.data):
+            self.data[key] = str(value).encode()
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    async def hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            raise ConnectionError("Connection refused")
+        return fail
+
+
+class TestContactsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ContactsCache(ttl=300, retry=5)
+        self.cache._redis = FakeRedis()
+        self.loads = 0
+
+    async def load(self):
+        self.loads += 1
+        return [Contact(id=1, first_name="Jon", last_name="Snow", email="jon@ex.com", phone_number="380501234567",
+                        date_of_birth=date(1990, 1, 1), info=None)], {"X-Next-Cursor": "abc"}
+
+    def read(self, user_id=1, key="list:id:0:100:None", if_none_match=None):
+        return asyncio.run(self.cache.json_response(user_id, key, self.load, CONTACT.dump_list, if_none_match))
+
+    def test_hit_is_served_without_loading(self):
+        first = self.read()
+        second = self.read()
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(second.body, first.body)
+        self.assertEqual(second.headers["X-Next-Cursor"], "abc")
+        self.assertEqual(json.loads(second.body)[0]["first_name"], "Jon")
+
+    def test_bump_invalidates_the_users_pages(self):
+        self.read(user_id=1)
+        self.read(user_id=2)
+        asyncio.run(self.cache.bump(1))
+        self.read(user_id=1)
+        self.read(user_id=2)
+        self.assertEqual(self.loads, 3)
+
+    def test_keys_are_separate(self):
+        self.read(key="list:id:0:100:None")
+        self.read(key="list:name:0:100:None")
+        self.assertEqual(self.loads, 2)
+
+    def test_redis_down_falls_back_to_loading(self):
+        self.cache._redis = DownRedis()
+        response = self.read()
+        asyncio.run(self.cache.bump(1))
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(json.loads(response.body)[0]["id"], 1)
+        self.assertNotIn("ETag", response.headers)
+        self.assertFalse(self.cache.available())
+
+    def test_current_etag_is_answered_without_loading(self):
+        etag = self.read().headers["ETag"]
+        self.cache._redis.data.clear()
+        self.cache._redis.data[self.cache.revision_key(1)] = b"1"
+        self.assertNotEqual(self.read().headers["ETag"], etag)
+        etag = self.read().headers["ETag"]
+        loads = self.loads
+        response = self.read(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(self.loads, loads)
+
+    def test_write_changes_the_etag(self):
+        etag = self.read().headers["ETag"]
+        asyncio.run(self.cache.bump(1))
+        response = self.read(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_etag_depends_on_the_read(self):
+        self.assertNotEqual(self.read(key="contact:1:id").headers["ETag"], self.read(key="contact:2:id").headers["ETag"])
+        self.assertNotEqual(self.read(user_id=1).headers["ETag"], self.read(user_id=2).headers["ETag"])
+
+    def test_etag_matching(self):
+        self.assertTrue(etag_matches('"a", W/"b"', '"b"'))
+        self.assertTrue(etag_matches('"a"', '"a"'))
+        self.assertFalse(etag_matches('"a"', '"b"'))
+        self.assertFalse(etag_matches('*', '"b"'))
+        self.assertFalse(etag_matches(None, '"b"'))
+
+
+class TestUserCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = UserCache(ttl=300, local_ttl=5, size=2, retry=5)
+        self.cache._redis = self.redis = FakeRedis()
+        self.user = User(id=1, username='jon', email='jon@ex.com', password='hash', refresh_token='token',
+                         created_at=datetime(2024, 7, 1, 12, 30), avatar=None, confirmed=True)
+
+    def test_miss_then_local_hit(self):
+        self.assertIsNone(asyncio.run(self.cache.get('jon@ex.com')))
+        asyncio.run(self.cache.set(self.user))
+        user = asyncio.run(self.cache.get('jon@ex.com'))
+        self.assertEqual((user.id, user.email, user.created_at, user.confirmed),
+                         (1, 'jon@ex.com', datetime(2024, 7, 1, 12, 30), True))
+        self.assertIsNot(user, self.user)
+        self.assertEqual(self.cache.stats, {"local_hits": 1, "redis_hits": 0, "misses": 1})
+
+    def test_secrets_are_not_cached(self):
+        asyncio.run(self.cache.set(self.user))
+        cached = json.loads(self.redis.data['user:jon@ex.com'])
+        self.assertNotIn('password', cached)
+        self.assertNotIn('refresh_token', cached)
+
+    def test_redis_tier_is_shared_between_workers(self):
+        asyncio.run(self.cache.set(self.user))
+        other = UserCache(ttl=300, local_ttl=5, size=2, retry=5)
+        other._redis = self.redis
+        self.assertEqual(asyncio.run(other.get('jon@ex.com')).id, 1)
+        self.assertEqual(other.stats["redis_hits"], 1)
+        self.assertIn('jon@ex.com', other.local)
+
+    def test_invalidate_drops_both_tiers(self):
+        asyncio.run(self.cache.set(self.user))
+        asyncio.run(self.cache.invalidate('jon@ex.com'))
+        self.assertIsNone(asyncio.run(self.cache.get('jon@ex.com')))
+        self.assertNotIn('user:jon@ex.com', self.redis.data)
+
+    def test_local_tier_evicts_least_recently_used(self):
+        for user_id in (1, 2, 3):
+            asyncio.run(self.cache.set(User(id=user_id, email=f'{user_id}@ex.com', created_at=None)))
+        self.assertEqual(list(self.cache.local), ['2@ex.com', '3@ex.com'])
+
+    def test_expired_local_entry_falls_back_to_redis(self):
+        asyncio.run(self.cache.set(self.user))
+        self.cache.local['jon@ex.com'] = (0, self.cache.local['jon@ex.com'][1])
+        asyncio.run(self.cache.get('jon@ex.com'))
+        self.assertEqual(self.cache.stats["redis_hits"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
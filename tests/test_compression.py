@@ -0,0 +1,99 @@
+import gzip
+import unittest
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from str.services.compression import CompressionMiddleware, GzipCompressor, negotiate
+
+BIG = [{"id": number, "first_name": "Jon", "last_name": "Snow"} for number in range(200)]
+
+
+async def chunks():
+    for number in range(3):
+        yield f'{{"id": {number}}}\n'.encode() * 100
+
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=500, encoders={"gzip": lambda: GzipCompressor(6)})
+
+
+@app.get("/big")
+def big():
+    return JSONResponse(BIG, headers={"ETag": '"abc"'})
+
+
+@app.get("/small")
+def small():
+    return {"access_token": "x"}
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+@app.get("/image")
+def image():
+    return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+
+@app.get("/no-content", status_code=204)
+def no_content():
+    return Response(status_code=204)
+
+
+class TestNegotiate(unittest.TestCase):
+
+    def test_server_preference_breaks_ties(self):
+        self.assertEqual(negotiate("gzip, br, zstd", ["zstd", "br", "gzip"]), "zstd")
+
+    def test_q_values(self):
+        self.assertEqual(negotiate("gzip;q=1.0, br;q=0.5", ["br", "gzip"]), "gzip")
+        self.assertEqual(negotiate("*;q=0.5, gzip;q=0", ["br", "gzip"]), "br")
+        self.assertIsNone(negotiate("gzip;q=0", ["gzip"]))
+        self.assertIsNone(negotiate("", ["gzip"]))
+        self.assertIsNone(negotiate("identity", ["gzip"]))
+
+
+class TestCompressionMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def get(self, url: str, encoding: str = "gzip"):
+        return self.client.get(url, headers={"Accept-Encoding": encoding})
+
+    def test_large_json_is_compressed(self):
+        response = self.get("/big")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(response.headers["Vary"], "Accept-Encoding")
+        self.assertEqual(response.headers["ETag"], 'W/"abc"')
+        self.assertLess(int(response.headers["Content-Length"]), len(response.content))
+        self.assertEqual(response.json(), BIG)
+
+    def test_small_response_is_not_compressed(self):
+        response = self.get("/small")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.json(), {"access_token": "x"})
+
+    def test_stream_is_compressed_chunk_by_chunk(self):
+        with self.client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+            self.assertEqual(response.headers["Content-Encoding"], "gzip")
+            self.assertNotIn("Content-Length", response.headers)
+            raw = b"".join(response.iter_raw())
+        self.assertEqual(gzip.decompress(raw), b"".join(f'{{"id": {n}}}\n'.encode() * 100 for n in range(3)))
+
+    def test_incompressible_types_are_left_alone(self):
+        self.assertNotIn("Content-Encoding", self.get("/image").headers)
+        self.assertEqual(self.get("/no-content").status_code, 204)
+
+    def test_client_without_gzip(self):
+        response = self.get("/big", encoding="identity")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.headers["ETag"], '"abc"')
+
+
+if __name__ == '__main__':
+    unittest.main()
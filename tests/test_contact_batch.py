@@ -0,0 +1,82 @@
+from datetime import date
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from main import app
+from str.database.models import Contact
+from str.repository.notes import apply_contact_batch
+from str.schemas import ContactBatch, ContactOperation
+from str.services.auth import auth_service
+
+
+def contact(name: str, born=date(1990, 3, 1)) -> dict:
+    return {"first_name": name, "last_name": "Batch", "email": f"{name.lower()}@example.com",
+            "phone_number": "0120104000", "date_of_birth": born.isoformat(), "info": None}
+
+
+def row(name: str) -> dict:
+    return {"first_name": name, "last_name": 'Batch', "email": f'{name.lower()}@example.com',
+            "date_of_birth": date(1990, 3, 1)}
+
+
+@pytest.fixture(scope="module")
+def users(session, add_user):
+    owner = add_user('batcher', [row('Keep'), row('Edit'), row('Drop')])
+    add_user('bystander', [row('Foreign')])
+    ids = dict(session.execute(select(Contact.first_name, Contact.id)).all())
+    return owner, ids
+
+
+def test_operation_needs_its_fields():
+    with pytest.raises(ValidationError):
+        ContactOperation(op='update', contact=contact('Nobody'))
+    with pytest.raises(ValidationError):
+        ContactOperation(op='create')
+    assert ContactOperation(op='delete', id=1).contact is None
+
+
+def test_batch_with_repeated_ids():
+    batch = ContactBatch(operations=[{"op": "delete", "id": 7}, {"op": "update", "id": 7, "contact": contact('Late')},
+                                     {"op": "delete", "id": 8}, {"op": "create", "id": 8, "contact": contact('New')},
+                                     {"op": "delete", "id": 9}, {"op": "delete", "id": 9}])
+    assert batch.repeated_ids() == [7, 9]
+    assert ContactBatch(operations=[{"op": "delete", "id": 7}, {"op": "delete", "id": 8}]).repeated_ids() == []
+
+
+def test_batch_route_rejects_repeated_ids(client, users):
+    owner, ids = users
+    app.dependency_overrides[auth_service.get_current_user] = lambda: owner
+    try:
+        response = client.post("/api/contacts/batch", json={"operations": [
+            {"op": "delete", "id": ids['Keep']}, {"op": "update", "id": ids['Keep'], "contact": contact('Late')}]})
+    finally:
+        del app.dependency_overrides[auth_service.get_current_user]
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == f"More than one operation on contacts {ids['Keep']}"
+
+
+def test_batch_applies_operations_in_one_go(run_db, session, users):
+    owner, ids = users
+    batch = ContactBatch(operations=[
+        {"op": "create", "contact": contact('New', date(2000, 12, 24))},
+        {"op": "update", "id": ids['Edit'], "contact": contact('Edited', date(1980, 6, 5))},
+        {"op": "delete", "id": ids['Drop']},
+        {"op": "delete", "id": ids['Foreign']},
+        {"op": "update", "id": 100000, "contact": contact('Ghost')},
+    ])
+
+    results = run_db(lambda db: apply_contact_batch(batch.operations, owner, db))
+    assert [result["status"] for result in results] == ["created", "updated", "deleted", "not_found", "not_found"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+
+    session.expire_all()
+    rows = session.execute(select(Contact.id, Contact.first_name, Contact.birth_day, Contact.user_id)
+                           .order_by(Contact.id)).all()
+    by_name = {row.first_name: row for row in rows}
+    assert set(by_name) == {'Keep', 'Edited', 'Foreign', 'New'}
+    assert by_name['New'].id == results[0]["id"]
+    assert by_name['New'].birth_day == 1224
+    assert by_name['Edited'].birth_day == 605
+    assert by_name['Foreign'].user_id != owner.id
@@ -0,0 +1,48 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date
+
+import pytest
+
+from str.conf.config import settings
+from str.services.contact_files import export_contacts, gzip_stream
+
+
+@pytest.fixture(scope="module")
+def owner(add_user):
+    return add_user('exporter', [{"first_name": f'Name{i}', "last_name": 'Export', "email": f'export{i}@example.com',
+                                  "date_of_birth": date(1990, 1, i + 1), "info": 'first' if i == 0 else None}
+                                 for i in range(7)])
+
+
+def export(run_db, owner, fmt, compress=False):
+    async def collect(db):
+        chunks = export_contacts(owner, db, fmt)
+        if compress:
+            chunks = gzip_stream(chunks)
+        return [chunk async for chunk in chunks]
+    return run_db(collect)
+
+
+def test_export_ndjson_in_batches(run_db, owner, monkeypatch):
+    monkeypatch.setattr(settings, 'export_batch_size', 3)
+    chunks = export(run_db, owner, 'ndjson')
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [row["first_name"] for row in rows] == [f'Name{i}' for i in range(7)]
+    assert rows[0]["date_of_birth"] == "1990-01-01"
+    assert rows[0]["info"] == "first"
+
+
+def test_export_csv(run_db, owner):
+    rows = list(csv.DictReader(io.StringIO(b"".join(export(run_db, owner, 'csv')).decode())))
+    assert len(rows) == 7
+    assert rows[6]["date_of_birth"] == "1990-01-07"
+    assert rows[6]["info"] == ""
+
+
+def test_export_gzip(run_db, owner):
+    data = gzip.decompress(b"".join(export(run_db, owner, 'ndjson', compress=True)))
+    assert len(data.decode().splitlines()) == 7
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+from sqlalchemy import event, inspect
+
+from str.schemas import ContactResponse
+from str.services.serializers import parse_fields, sparse_serializer
+import str.repository.notes as repository_notes
+
+
+@pytest.fixture(scope="module")
+def owner(add_user):
+    return add_user('sparse', [{"first_name": f'Ann{n}', "last_name": 'Lee', "email": f'ann{n}@example.com',
+                                "info": 'x' * 350} for n in range(3)])
+
+
+def run(run_db, call):
+    # returns the result of call(db) and the statements it executed
+    async def run_call(db):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.get_bind(), "before_cursor_execute", record)
+        try:
+            return await call(db), statements
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", record)
+    return run_db(run_call)
+
+
+def test_only_requested_columns_are_selected(run_db, owner):
+    contacts, statements = run(run_db, lambda db: repository_notes.get_contacts(
+        0, 10, owner, db, fields=('first_name', 'phone_number')))
+    assert len(contacts) == 3
+    assert 'info' not in statements[0] and 'email' not in statements[0]
+    assert {'info', 'email'} <= inspect(contacts[0]).unloaded
+
+
+def test_sort_key_is_loaded_for_the_cursor(run_db, owner):
+    contacts, _ = run(run_db, lambda db: repository_notes.get_contacts(
+        0, 2, owner, db, sort='name', fields=('phone_number',)))
+    cursor = repository_notes.encode_cursor(contacts[-1], 'name')
+    assert repository_notes.decode_cursor(cursor, 'name') == ('Lee', 'Ann1', contacts[-1].id)
+
+
+def test_all_columns_without_fields(run_db, owner):
+    contact, _ = run(run_db, lambda db: repository_notes.get_contacts(0, 1, owner, db))
+    assert contact[0].info == 'x' * 350
+
+
+def test_sparse_serializer_returns_the_fields(run_db, owner):
+    serializer = sparse_serializer(ContactResponse, parse_fields(ContactResponse, 'phone_number, first_name'))
+    contacts, _ = run(run_db, lambda db: repository_notes.find_name(
+        'Ann', 0, 10, owner, db, serializer.fields))
+    assert json.loads(serializer.dump_list(contacts))[0] == {'first_name': 'Ann0', 'phone_number': '0120104000'}
+    assert serializer is sparse_serializer(ContactResponse, ('first_name', 'phone_number'))
+
+
+def test_unknown_field_is_rejected():
+    with pytest.raises(ValueError):
+        parse_fields(ContactResponse, 'first_name,info')
+    with pytest.raises(ValueError):
+        parse_fields(ContactResponse, ' , ')
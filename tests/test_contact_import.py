@@ -0,0 +1,72 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import select
+
+from str.conf.config import settings
+from str.database.models import Contact
+from str.services.contact_files import InvalidImportFile, file_format, import_contacts
+
+CSV = """first_name,last_name,email,phone_number,date_of_birth,info
+Jon,Smith,jon@example.com,0120104000,2000-02-29,
+Anna,Brown,not-an-email,0120104000,1999-01-01,friend
+Ivan,Petrenko,ivan@example.com,+380501234567,1985-12-31,colleague
+"""
+
+
+@pytest.fixture(scope="module")
+def owner(add_user):
+    return add_user('importer')
+
+
+def run_import(run_db, owner, data: bytes, fmt: str):
+    return run_db(lambda db: import_contacts(io.BytesIO(data), fmt, owner, db))
+
+
+def test_file_format():
+    assert file_format('contacts.CSV') == 'csv'
+    assert file_format('contacts.jsonl') == 'ndjson'
+    assert file_format('contacts.txt', 'ndjson') == 'ndjson'
+    assert file_format('contacts.txt') is None
+
+
+def test_import_csv_reports_invalid_rows(run_db, session, owner, monkeypatch):
+    monkeypatch.setattr(settings, 'import_batch_size', 2)
+    result = run_import(run_db, owner, CSV.encode(), 'csv')
+    assert result["imported"] == 2
+    assert result["failed"] == 1
+    assert result["errors"][0]["row"] == 2
+    assert result["errors"][0]["error"].startswith("email:")
+    contacts = session.execute(select(Contact).filter(Contact.user_id == owner.id).order_by(Contact.id)).scalars().all()
+    assert [(c.first_name, c.birth_day, c.info) for c in contacts] == [('Jon', 229, None), ('Ivan', 1231, 'colleague')]
+
+
+def test_import_ndjson(run_db, owner, monkeypatch):
+    monkeypatch.setattr(settings, 'import_max_errors', 1)
+    rows = [json.dumps({"first_name": f"N{i}", "last_name": "Json", "email": f"n{i}@example.com",
+                        "phone_number": "0120104000", "date_of_birth": "1990-05-17"}) for i in range(5)]
+    data = "\n".join(rows + ["{broken", "[1, 2]", ""]).encode()
+    result = run_import(run_db, owner, data, 'ndjson')
+    assert result["imported"] == 5
+    assert result["failed"] == 2
+    assert [error["row"] for error in result["errors"]] == [6]
+
+
+def test_import_csv_reports_long_and_undecodable_rows(run_db, owner):
+    data = (CSV.splitlines()[0] + "\n"
+            + "Olga,Long,olga@example.com,0120104000,1990-01-01,,extra,fields\n"
+            + "Taras,Latin,taras@example.com,0120104000,1990-01-01,caf\xe9\n"
+            + "Iryna,Fine,iryna@example.com,0120104000,1990-01-01,\n").encode('latin-1')
+    result = run_import(run_db, owner, data, 'csv')
+    assert result["imported"] == 1
+    assert result["errors"] == [{"row": 1, "error": "Row has 2 more fields than the header"},
+                                {"row": 2, "error": "Row is not UTF-8 text"}]
+
+
+def test_import_rejects_file_not_in_utf8(run_db, owner):
+    with pytest.raises(InvalidImportFile):
+        run_import(run_db, owner, CSV.encode('utf-16'), 'csv')
+    data = ('{"first_name": "Ok"}\n{"first_name": "caf\xe9"}\n').encode('latin-1')
+    result = run_import(run_db, owner, data, 'ndjson')
+    assert result["errors"][1] == {"row": 2, "error": "Row is not UTF-8 text"}
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from str.database.models import User
+import str.repository.notes as repository_notes
+
+INDEXES = ('ix_contacts_user_id_id', 'ix_contacts_user_id_last_name_first_name_id', 'ix_contacts_user_id_email',
+           'ix_contacts_user_id_birth_day', 'ix_contacts_user_id_created_at_id')
+
+
+def query_plan(session, call) -> str:
+    """Run a repository call against a mocked session and EXPLAIN the statement it executes."""
+    db = MagicMock(spec=AsyncSession)
+    db.execute.return_value = MagicMock()
+    asyncio.run(call(db))
+    stmt = db.execute.call_args[0][0]
+    sql = str(stmt.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}))
+    rows = session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return " ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("call", [
+    lambda db: repository_notes.get_contacts(0, 100, User(id=1), db),
+    lambda db: repository_notes.find_name('Jon', 0, 100, User(id=1), db),
+    lambda db: repository_notes.find_email('ex.com', 0, 100, User(id=1), db),
+    lambda db: repository_notes.get_upcoming_birthdays(0, 100, User(id=1), db, 7),
+])
+def test_hot_queries_use_user_indexes(session, call):
+    plan = query_plan(session, call)
+    assert "SCAN contacts" not in plan, plan
+    assert any(index in plan for index in INDEXES), plan
+
+
+def test_get_contact_is_an_index_lookup(session):
+    plan = query_plan(session, lambda db: repository_notes.get_contact(1, User(id=1), db))
+    assert "SCAN contacts" not in plan, plan
+    assert "SEARCH contacts" in plan, plan
+
+
+@pytest.mark.parametrize("sort, after", [
+    ('id', (10,)),
+    ('name', ('Smith', 'Jon', 10)),
+    ('created', (datetime(2024, 7, 1), 10)),
+])
+def test_keyset_pages_read_the_index_in_order(session, sort, after):
+    plan = query_plan(session, lambda db: repository_notes.get_contacts(0, 100, User(id=1), db, sort, after))
+    assert "SCAN contacts" not in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import inspect, select
+
+from str.database.models import Contact
+import str.repository.notes as repository_notes
+
+
+def row(name: str) -> dict:
+    return {"first_name": name, "last_name": 'Lee', "email": f'{name.lower()}@example.com'}
+
+
+@pytest.fixture(scope="module")
+def contacts(session, add_user):
+    owner = add_user('lookup', [row(f'Ann{n}') for n in range(3)])
+    other = add_user('other', [row('Bob')])
+    mine = session.execute(select(Contact.id).filter(Contact.user_id == owner.id).order_by(Contact.id)).scalars().all()
+    theirs = session.execute(select(Contact.id).filter(Contact.user_id == other.id)).scalar_one()
+    return owner, mine, theirs
+
+
+def lookup(run_db, ids, user, fields=None):
+    return run_db(lambda db: repository_notes.get_contacts_by_ids(ids, user, db, fields))
+
+
+def test_contacts_come_in_the_requested_order(run_db, contacts):
+    owner, mine, _ = contacts
+    ids = [mine[2], mine[0], mine[1]]
+    assert [contact.id for contact in lookup(run_db, ids, owner)] == ids
+
+
+def test_missing_and_foreign_ids_are_left_out(run_db, contacts):
+    owner, mine, theirs = contacts
+    found = lookup(run_db, [theirs, mine[1], 999999], owner)
+    assert [contact.id for contact in found] == [mine[1]]
+
+
+def test_lookup_loads_only_the_fields(run_db, contacts):
+    owner, mine, _ = contacts
+    found = lookup(run_db, mine[:1], owner, ('first_name',))
+    assert found[0].first_name == 'Ann0'
+    assert 'email' in inspect(found[0]).unloaded
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from str.database.models import Contact
+import str.repository.notes as repository_notes
+
+
+@pytest.fixture(scope="module")
+def owner(add_user):
+    created = datetime(2024, 7, 1)
+    # duplicate names and creation times, so the id has to break the ties
+    return add_user('pager', [{"first_name": f'First{i % 3}', "last_name": f'Last{i % 4}',
+                               "email": f'page{i}@example.com', "created_at": created + timedelta(minutes=i % 5)}
+                              for i in range(23)])
+
+
+def walk(run_db, owner, sort, limit):
+    async def pages(db):
+        seen, after = [], None
+        while True:
+            page = await repository_notes.get_contacts(0, limit, owner, db, sort, after)
+            seen.extend(contact.id for contact in page)
+            if len(page) < limit:
+                return seen
+            after = repository_notes.decode_cursor(repository_notes.encode_cursor(page[-1], sort), sort)
+    return run_db(pages)
+
+
+@pytest.mark.parametrize("sort", ['id', 'name', 'created'])
+def test_cursor_walk_matches_offset_listing(run_db, owner, sort):
+    expected = [contact.id for contact in run_db(lambda db: repository_notes.get_contacts(0, 100, owner, db, sort))]
+    assert len(expected) == 23
+    assert walk(run_db, owner, sort, 5) == expected
+
+
+def test_cursor_walk_by_default_creation_time(run_db, add_user):
+    # created within the same second, with the creation time set by the model
+    owner = add_user('same-second', [{"first_name": 'Same', "last_name": f'Second{i}', "email": f'same{i}@example.com'}
+                                     for i in range(10)])
+    assert len(walk(run_db, owner, 'created', 3)) == 10
+
+
+@pytest.mark.parametrize("cursor, sort", [
+    ('not a cursor', 'id'),
+    (repository_notes.encode_cursor(Contact(id=1), 'id'), 'name'),
+    (repository_notes.encode_cursor(Contact(id=1, created_at=None), 'created'), 'created'),
+])
+def test_decode_invalid_cursor(cursor, sort):
+    with pytest.raises(ValueError):
+        repository_notes.decode_cursor(cursor, sort)
@@ -0,0 +1,38 @@
+import pytest
+
+import str.repository.notes as repository_notes
+
+
+def contact(first_name: str, last_name: str, email: str) -> dict:
+    return {"first_name": first_name, "last_name": last_name, "email": email}
+
+
+@pytest.fixture(scope="module")
+def owner(add_user):
+    add_user('stranger', [contact('Jon', 'Stranger', 'jon@example.com')])
+    return add_user('searcher', [contact('Jon', 'Smith', 'jon.smith@example.com'),
+                                 contact('Jonathan', 'Jonson', 'jonathan@example.com'),
+                                 contact('Anna', 'Smithers', 'anna@mail.org')])
+
+
+def test_find_name_ranks_matches_of_the_user(run_db, owner):
+    contacts = run_db(lambda db: repository_notes.find_name('Jon', 0, 10, owner, db))
+    assert {(c.first_name, c.last_name) for c in contacts} == {('Jon', 'Smith'), ('Jonathan', 'Jonson')}
+    assert contacts[0].last_name == 'Jonson'
+
+
+def test_find_name_paginates(run_db, owner):
+    first = run_db(lambda db: repository_notes.find_name('Smith', 0, 1, owner, db))
+    second = run_db(lambda db: repository_notes.find_name('Smith', 1, 1, owner, db))
+    assert len(first) == len(second) == 1
+    assert first[0].id != second[0].id
+
+
+def test_find_email_matches_substring(run_db, owner):
+    contacts = run_db(lambda db: repository_notes.find_email('example.com', 0, 10, owner, db))
+    assert sorted(c.email for c in contacts) == ['jon.smith@example.com', 'jonathan@example.com']
+
+
+def test_short_query_falls_back_to_like(run_db, owner):
+    contacts = run_db(lambda db: repository_notes.find_name('An', 0, 10, owner, db))
+    assert [c.first_name for c in contacts] == ['Jonathan', 'Anna']
@@ -0,0 +1,123 @@
+import asyncio
+import unittest
+from email.message import EmailMessage
+from unittest.mock import AsyncMock, patch
+
+from str.services import email as email_service
+from str.services.email import Mailer
+from tests.smtp_server import LocalSMTPServer
+
+
+def message(number: int) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = f"Message {number}"
+    msg["From"] = "app@example.com"
+    msg["To"] = f"user{number}@example.com"
+    msg.set_content(f"Hello {number}")
+    return msg
+
+
+class TestMailer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.server = await LocalSMTPServer().start()
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    def mailer(self, **kwargs) -> Mailer:
+        options = {"pool_size": 1, "queue_size": 100, "batch_size": 10, "retries": 2, "backoff": 0,
+                   "idle_timeout": 60, **kwargs}
+        return Mailer(self.server.options, **options)
+
+    async def test_messages_share_one_connection(self):
+        mailer = self.mailer()
+        for number in range(5):
+            await mailer.enqueue(message(number))
+        await mailer.stop(timeout=5)
+        self.assertEqual([msg["Subject"] for msg in self.server.messages], [f"Message {n}" for n in range(5)])
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(mailer.stats["sent"], 5)
+
+    async def test_dropped_connection_is_retried(self):
+        self.server.drop_connections = 1
+        mailer = self.mailer()
+        await mailer.enqueue(message(1))
+        await mailer.stop(timeout=5)
+        self.assertEqual(len(self.server.messages), 1)
+        self.assertEqual(mailer.stats["retried"], 1)
+        self.assertEqual(mailer.stats["failed"], 0)
+
+    async def test_gives_up_after_retries(self):
+        self.server.drop_connections = 3
+        mailer = self.mailer()
+        await mailer.enqueue(message(1))
+        await mailer.enqueue(message(2))
+        await mailer.stop(timeout=5)
+        self.assertEqual([msg["Subject"] for msg in self.server.messages], ["Message 2"])
+        self.assertEqual(mailer.stats["failed"], 1)
+
+    async def test_idle_connection_is_closed(self):
+        mailer = self.mailer(idle_timeout=0.01)
+        await mailer.enqueue(message(1))
+        await mailer.queue.join()
+        await asyncio.sleep(0.05)
+        await mailer.enqueue(message(2))
+        await mailer.stop(timeout=5)
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 2)
+
+    async def test_connections_opened_on_start(self):
+        mailer = self.mailer(pool_size=2)
+        mailer.start(connect=True)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.server.connections, 2)
+        await mailer.enqueue(message(1))
+        await mailer.stop(timeout=5)
+        self.assertEqual(len(self.server.messages), 1)
+        self.assertEqual(self.server.connections, 2)
+
+    async def test_unexpected_error_fails_only_its_message(self):
+        mailer = self.mailer()
+        connect = mailer.connect
+        attempts = []
+
+        async def flaky_connect():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("unexpected")
+            return await connect()
+
+        mailer.connect = flaky_connect
+        await mailer.enqueue(message(1))
+        await mailer.enqueue(message(2))
+        await asyncio.wait_for(mailer.queue.join(), 1)
+        await mailer.stop(timeout=5)
+        self.assertEqual([msg["Subject"] for msg in self.server.messages], ["Message 2"])
+        self.assertEqual(mailer.stats["failed"], 1)
+
+    async def test_stopped_worker_is_replaced(self):
+        mailer = self.mailer()
+        mailer.start()
+        mailer.workers[0].cancel()
+        await asyncio.sleep(0)
+        await mailer.enqueue(message(1))
+        await asyncio.wait_for(mailer.queue.join(), 1)
+        await mailer.stop(timeout=5)
+        self.assertEqual(len(self.server.messages), 1)
+
+
+class TestSendEmail(unittest.IsolatedAsyncioTestCase):
+
+    async def test_confirmation_is_rendered_and_queued(self):
+        with patch.object(email_service.mailer, 'enqueue', new_callable=AsyncMock) as enqueue:
+            await email_service.send_email('jon@example.com', 'Jon', 'http://testserver/')
+        msg = enqueue.call_args[0][0]
+        self.assertEqual(msg["To"], 'jon@example.com')
+        body = msg.get_content()
+        self.assertIn('Hi Jon,', body)
+        self.assertIn('http://testserver/api/auth/confirmed_email/', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+class TestInternalAccess(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_disabled_without_a_token(self):
+        with patch('str.routes.internal.settings.internal_token', ''):
+            self.assertEqual(self.client.get("/api/internal/pool").status_code, 404)
+            self.assertEqual(self.client.get("/api/internal/user-cache",
+                                             headers={"Authorization": "Bearer "}).status_code, 404)
+
+    def test_requires_the_token(self):
+        with patch('str.routes.internal.settings.internal_token', 'scrape-me'):
+            for path in ("/api/internal/pool", "/api/internal/user-cache"):
+                self.assertEqual(self.client.get(path).status_code, 401)
+                self.assertEqual(self.client.get(path, headers={"Authorization": "Bearer wrong"}).status_code, 401)
+                self.assertEqual(self.client.get(path, headers={"Authorization": "Bearer scrape-me"}).status_code,
+                                 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from main import app as main_app
+from str.services.metrics import Counter, Histogram, MetricsMiddleware, Registry, observe_queries, query_duration, \
+    request_duration, stats_metrics
+
+app = FastAPI()
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/items/{item_id}")
+def read_item(item_id: int):
+    return {"id": item_id}
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("took_seconds", "Time taken.", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "/a")
+        self.assertEqual(histogram.render()[2:], [
+            'took_seconds_bucket{route="/a",le="0.1"} 2',
+            'took_seconds_bucket{route="/a",le="1.0"} 3',
+            'took_seconds_bucket{route="/a",le="+Inf"} 4',
+            'took_seconds_sum{route="/a"} 3.65',
+            'took_seconds_count{route="/a"} 4',
+        ])
+
+    def test_registry_renders_metrics_and_collectors(self):
+        registry = Registry()
+        registry.add(Counter("hits_total", "Hits.", ("path",))).inc('say "hi"')
+        registry.collector(lambda: stats_metrics("mail", {"sent": 3, "queue_size": 1}, counters=("sent",)))
+        lines = registry.render().splitlines()
+        self.assertIn('hits_total{path="say \\"hi\\""} 1', lines)
+        self.assertIn("# TYPE mail_sent_total counter", lines)
+        self.assertIn("mail_queue_size 1", lines)
+
+    def test_requests_are_labelled_by_route_template(self):
+        client = TestClient(app)
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/missing")
+        counts, _ = request_duration.values[("GET", "/items/{item_id}", 200)]
+        self.assertEqual(sum(counts), 2)
+        self.assertIn(("GET", "unmatched", 404), request_duration.values)
+
+    def test_queries_are_timed(self):
+        engine = create_async_engine("sqlite+aiosqlite://")
+        observe_queries(engine, "test")
+
+        async def run():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            await engine.dispose()
+
+        asyncio.run(run())
+        counts, total = query_duration.values[("test", "SELECT")]
+        self.assertEqual(sum(counts), 1)
+        self.assertGreater(total, 0)
+
+    def test_metrics_endpoint(self):
+        client = TestClient(main_app)
+        with patch('str.routes.internal.settings.internal_token', 'scrape-me'):
+            self.assertEqual(client.get("/metrics").status_code, 401)
+            response = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+        with patch('str.routes.internal.settings.internal_token', ''):
+            self.assertEqual(client.get("/metrics").status_code, 404)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE http_requests_in_flight gauge", response.text)
+        self.assertIn("rate_limit_limited_total", response.text)
+        self.assertIn("db_pool_checkouts_total", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+from passlib.context import CryptContext
+
+from str.services import passwords
+
+
+class TestPasswords(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hash_and_verify(self):
+        hashed = await passwords.hash_password('secret')
+        self.assertEqual(await passwords.verify_password('secret', hashed), (True, None))
+        self.assertEqual(await passwords.verify_password('wrong', hashed), (False, None))
+
+    async def test_hashing_runs_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        with patch.object(passwords.pwd_context, 'hash', side_effect=lambda password: threading.get_ident()):
+            self.assertNotEqual(await passwords.hash_password('secret'), loop_thread)
+
+    async def test_outdated_cost_is_rehashed(self):
+        old = CryptContext(schemes=['bcrypt'], bcrypt__rounds=4).hash('secret')
+        verified, new_hash = await passwords.verify_password('secret', old)
+        self.assertTrue(verified)
+        self.assertTrue(new_hash.startswith(f"$2b${passwords.pwd_context.to_dict()['bcrypt__rounds']:02d}$"))
+        self.assertEqual(await passwords.verify_password('secret', new_hash), (True, None))
+
+    async def test_parallel_requests_are_bounded_by_the_pool(self):
+        hashes = await asyncio.gather(*[passwords.hash_password(f'secret{i}') for i in range(4)])
+        self.assertEqual(len(set(hashes)), 4)
+        self.assertLessEqual(len([thread for thread in threading.enumerate()
+                                  if thread.name.startswith('password-hash')]), passwords.executor._max_workers)
+
+
+class TestCalibrate(unittest.TestCase):
+
+    def test_cheapest_cost_when_target_is_unreachable(self):
+        self.assertEqual(passwords.calibrate('bcrypt', 0)["value"], 4)
+
+    def test_cost_stays_under_target(self):
+        result = passwords.calibrate('bcrypt', 0.05)
+        self.assertEqual(result["setting"], "bcrypt_rounds")
+        self.assertLessEqual(result["seconds"], 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
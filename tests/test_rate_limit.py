@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from fastapi import HTTPException, Request
+from redis.exceptions import ConnectionError
+
+from str.services.auth import auth_service
+from str.services.rate_limit import RateLimiter
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def incrby(self, key, amount):
+        self.commands.append((key, amount))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        # give concurrent requests a chance to run while the round trip is pending
+        await asyncio.sleep(0)
+        if self.redis.down:
+            raise ConnectionError("Connection refused")
+        results = []
+        for key, amount in self.commands:
+            self.redis.calls += 1
+            self.redis.data[key] = self.redis.data.get(key, 0) + amount
+            results += [self.redis.data[key], True]
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+async def contacts():
+    pass
+
+
+def request(ip='10.0.0.1', token=None) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "GET", "path": "/api/contacts/", "headers": headers,
+                    "client": (ip, 5000), "endpoint": contacts})
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('str.services.rate_limit.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        RateLimiter.buckets = {}
+        RateLimiter.down_until = 0.0
+
+    def hit(self, limiter, n=1, **kwargs) -> list:
+        statuses = []
+        for _ in range(n):
+            try:
+                asyncio.run(limiter(request(**kwargs)))
+                statuses.append(200)
+            except HTTPException as e:
+                statuses.append(e.status_code)
+        return statuses
+
+    def test_quota_is_leased_in_slices(self):
+        limiter = RateLimiter(times=8, seconds=60)
+        self.assertEqual(self.hit(limiter, 9), [200] * 8 + [429])
+        self.assertEqual(self.redis.calls, 5)
+        self.hit(limiter, 3)
+        self.assertEqual(self.redis.calls, 5)
+
+    def test_concurrent_requests_share_one_lease(self):
+        limiter = RateLimiter(times=8, seconds=60)
+
+        async def burst():
+            return await asyncio.gather(*(limiter(request()) for _ in range(12)), return_exceptions=True)
+
+        results = asyncio.run(burst())
+        self.assertEqual(sum(result is None for result in results), 8)
+        self.assertEqual({result.status_code for result in results if result is not None}, {429})
+        self.assertEqual(self.redis.calls, 5)
+
+    def test_limited_response_says_when_to_retry(self):
+        limiter = RateLimiter(times=1, seconds=60)
+        self.hit(limiter)
+        with self.assertRaises(HTTPException) as e:
+            asyncio.run(limiter(request()))
+        self.assertTrue(0 < int(e.exception.headers["Retry-After"]) <= 60)
+
+    def test_workers_share_the_quota(self):
+        limiter = RateLimiter(times=8, seconds=60)
+        workers = ({}, {})
+        allowed = 0
+        for _ in range(4):
+            for worker in workers:
+                RateLimiter.buckets = worker
+                allowed += self.hit(limiter, 2).count(200)
+        self.assertEqual(allowed, 8)
+        for worker in workers:
+            RateLimiter.buckets = worker
+            self.assertEqual(self.hit(limiter), [429])
+
+    def test_users_have_their_own_quota(self):
+        limiter = RateLimiter(times=2, seconds=60)
+        jon = asyncio.run(auth_service.create_access_token({"sub": "jon@example.com"}))
+        ann = asyncio.run(auth_service.create_access_token({"sub": "ann@example.com"}))
+        self.assertEqual(self.hit(limiter, 3, token=jon), [200, 200, 429])
+        self.assertEqual(self.hit(limiter, 2, token=ann), [200, 200])
+
+    def test_invalid_token_is_limited_by_address(self):
+        limiter = RateLimiter(times=2, seconds=60)
+        self.assertEqual(self.hit(limiter, 2, token='forged'), [200, 200])
+        self.assertEqual(self.hit(limiter, 1), [429])
+        self.assertEqual(self.hit(limiter, 1, ip='10.0.0.2'), [200])
+
+    def test_fail_open_limits_each_worker_alone(self):
+        self.redis.down = True
+        limiter = RateLimiter(times=3, seconds=60)
+        self.assertEqual(self.hit(limiter, 4), [200, 200, 200, 429])
+        self.assertEqual(RateLimiter.stats["errors"] > 0, True)
+
+    def test_fail_closed_refuses_requests(self):
+        self.redis.down = True
+        with patch('str.services.rate_limit.settings.rate_limit_fail_open', False):
+            self.assertEqual(self.hit(RateLimiter(times=3, seconds=60), 1), [503])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from str.database.replicas import ReplicaSet
+
+
+class DownReplica:
+    """Stand-in for a replica that cannot be reached."""
+
+    def connect(self):
+        raise OSError("Connection refused")
+
+
+class FakeRedis:
+    """Redis of the write markers, shared by the workers of a test."""
+
+    def __init__(self):
+        self.expires = {}
+        self.down = False
+
+    async def set(self, key, value, px):
+        if self.down:
+            raise ConnectionError("Connection refused")
+        self.expires[key] = time.monotonic() + px / 1000
+
+    async def exists(self, key):
+        if self.down:
+            raise ConnectionError("Connection refused")
+        return int(self.expires.get(key, 0) > time.monotonic())
+
+
+def replica_set(tmp_path, *names, read_your_writes=5, redis=None):
+    engines = [DownReplica() if name is None else
+               create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}", poolclass=NullPool) for name in names]
+    return ReplicaSet(engines, check_interval=60, check_timeout=2, read_your_writes=read_your_writes,
+                      redis=redis and (lambda: redis))
+
+
+def mark_write(replicas, subject):
+    asyncio.run(replicas.mark_write(subject))
+
+
+def pick(replicas, subject=None, times=1):
+    async def run():
+        return [await replicas.pick(subject) for _ in range(times)]
+    return asyncio.run(run())
+
+
+def test_round_robin(tmp_path):
+    replicas = replica_set(tmp_path, 'a.db', 'b.db')
+    first, second = replicas.engines
+    assert pick(replicas, times=4) == [first, second, first, second]
+
+
+def test_unhealthy_replica_is_skipped(tmp_path):
+    replicas = replica_set(tmp_path, None, 'b.db')
+    healthy = replicas.engines[1]
+    assert pick(replicas, times=3) == [healthy, healthy, healthy]
+
+
+def test_no_healthy_replica_falls_back_to_primary(tmp_path):
+    replicas = replica_set(tmp_path, None)
+    assert pick(replicas) == [None]
+
+
+def test_read_your_writes(tmp_path):
+    replicas = replica_set(tmp_path, 'a.db')
+    mark_write(replicas, 'writer@example.com')
+    assert pick(replicas, 'writer@example.com') == [None]
+    assert pick(replicas, 'reader@example.com') == replicas.engines
+
+
+def test_read_your_writes_window_expires(tmp_path):
+    replicas = replica_set(tmp_path, 'a.db', read_your_writes=0)
+    mark_write(replicas, 'writer@example.com')
+    assert pick(replicas, 'writer@example.com') == replicas.engines
+
+
+def test_without_replicas_reads_go_to_primary():
+    replicas = ReplicaSet([], check_interval=60, check_timeout=2, read_your_writes=5)
+    mark_write(replicas, 'writer@example.com')
+    assert replicas.writes == {}
+    assert pick(replicas) == [None]
+
+
+def test_read_your_writes_across_workers(tmp_path):
+    redis = FakeRedis()
+    writer, other = replica_set(tmp_path, 'a.db', redis=redis), replica_set(tmp_path, 'a.db', redis=redis)
+    mark_write(writer, 'writer@example.com')
+    assert pick(other, 'writer@example.com') == [None]
+    assert pick(other, 'reader@example.com') == other.engines
+
+
+def test_read_your_writes_without_redis_stays_local(tmp_path):
+    redis = FakeRedis()
+    redis.down = True
+    writer, other = replica_set(tmp_path, 'a.db', redis=redis), replica_set(tmp_path, 'a.db', redis=redis)
+    mark_write(writer, 'writer@example.com')
+    assert pick(writer, 'writer@example.com') == [None]
+    assert pick(other, 'writer@example.com') == other.engines
+    assert writer.down_until > 0 and other.down_until > 0
@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import MagicMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 import sys
@@ -27,7 +27,9 @@ from str.repository.notes import (
 class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1)
         self.contact = Contact(first_name= 'Jon', last_name ='Smith', 
                             email= 'teexample@ex.com', phone_number='0120104000', 
@@ -37,44 +39,44 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     async def test_get_contacts(self):
         notes = [Contact(), Contact(), Contact()]
-        self.session.query().filter().offset().limit().all.return_value = notes
+        self.result.scalars().all.return_value = notes
         result = await get_contacts(skip=0, limit=10, user=self.user, db=self.session)
         self.assertEqual(result, notes)
 
     async def test_get_contact_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_get_note_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
-# get contact for email
+# get contacts for email
     async def test_get_contact_from_email(self):
-        contact = Contact(email='exam@com.ua')
-        self.session.query().filter().first.return_value = contact
-        result = await find_email(contact_email='exam@com.ua', user=self.user, db=self.session)
-        self.assertEqual(result, contact)
+        notes = [Contact(email='exam@com.ua')]
+        self.result.scalars().all.return_value = notes
+        result = await find_email(contact_email='exam@com.ua', skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, notes)
 
     async def test_get_contact_from_email_none(self):
-        self.session.query().filter().first.return_value = None
-        result = await find_email(contact_email='exam@com.ua', user=self.user, db=self.session)
-        self.assertIsNone(result)
+        self.result.scalars().all.return_value = []
+        result = await find_email(contact_email='exam@com.ua', skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, [])
 
-# get contact for first or last name
+# get contacts for first or last name
     async def test_get_contact_from_name(self):
-        contact = Contact(first_name='Ron')
-        self.session.query().filter().first.return_value = contact
-        result = await find_name(contact_name='Ron', user=self.user, db=self.session)
-        self.assertEqual(result, contact)
+        notes = [Contact(first_name='Ron'), Contact(last_name='Ronson')]
+        self.result.scalars().all.return_value = notes
+        result = await find_name(contact_name='Ron', skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, notes)
 
     async def test_get_contact_from_name_none(self):
-        self.session.query().filter().first.return_value = None
-        result = await find_name(contact_name='Ron', user=self.user, db=self.session)
-        self.assertIsNone(result)
+        self.result.scalars().all.return_value = []
+        result = await find_name(contact_name='Ron', skip=0, limit=10, user=self.user, db=self.session)
+        self.assertEqual(result, [])
         
 # get upcomming_birthdays
     async def test_get_upcomming_birthdays(self):
@@ -82,19 +84,16 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
                  Contact(date_of_birth=datetime.strptime('2002-07-15', "%Y-%m-%d").date()), 
                  Contact(date_of_birth=datetime.strptime('2005-07-17', "%Y-%m-%d").date()),
                  self.contact]
-        self.session.query().filter().offset().limit().all.return_value = notes
-        results = await get_upcoming_birthdays(skip=0, limit=10, user=self.user, db=self.session)
-        # result_dates = [result.date_of_birth for result in results]
-        # note_dates = [note.date_of_birth for note in notes]
-        # print(f"Result dates: {result_dates}")
-        # print(f"Note dates: {note_dates}")
+        self.result.scalars().all.return_value = notes
+        results = await get_upcoming_birthdays(skip=0, limit=10, user=self.user, db=self.session,
+                                               today=date(2024, 7, 15))
         self.assertEqual(notes, results)
 
     async def test_get_upcomming_birthdays_none(self):
 
-        self.session.query().filter().offset().limit().all.return_value = None
+        self.result.scalars().all.return_value = []
         results = await get_upcoming_birthdays(skip=0, limit=10, user=self.user, db=self.session)
-        self.assertIsNone(results)
+        self.assertEqual(results, [])
 
     async def test_create_note(self):
         
@@ -109,12 +108,12 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     async def test_remove_note_found(self):
         contact = Contact()
-        self.session.query().filter().first.return_value = contact
+        self.result.scalars().first.return_value = contact
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_remove_note_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await remove_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
@@ -124,7 +123,7 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
                             date_of_birth=self.test_dateobj , info='it is a model of contact update')
         
         note = Contact(email=body.email)
-        self.session.query().filter().first.return_value = note
+        self.result.scalars().first.return_value = note
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertEqual(result, note)
@@ -133,7 +132,7 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
         body = ContactModel(first_name= 'Ron', last_name ='Smith', 
                             email= 'testexample@ex.com', phone_number='0120104512', 
                             date_of_birth=self.test_dateobj, info='it is a model of contact')
-        self.session.query().filter().first.return_value = None
+        self.result.scalars().first.return_value = None
         self.session.commit.return_value = None
         result = await update_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertIsNone(result)
@@ -5,7 +5,7 @@ import os
 # Додавання шляху до директорії з модулем
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date
 
 from str.database.models import User
@@ -19,23 +19,25 @@ from str.repository.users import (
 
 class TestNotes(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = MagicMock(spec=AsyncSession)
+        self.result = MagicMock()
+        self.session.execute.return_value = self.result
         self.user = User(id=1, username= 'Eric Tomas', email= 'example@meta.com', password='12345usertest')
     
     async def test_get_user_by_email(self):
         user = self.user
-        self.session.query().filter().first.return_value = self.user
+        self.result.scalars().first.return_value = self.user
         result = await get_user_by_email(email="example@meta.com", db=self.session)
         self.assertEqual(result, user)
     
     async def test_get_user_by_email_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await get_user_by_email(email="example@meta.com", db=self.session)
         self.assertIsNone(result)
 
     async def test_create_user(self):
         user = UserModel(username= 'Irys Toreno', email= 'eeee0123@meta.com', password='usercst001')
-        self.session.query().filter().first.return_value = self.user
+        self.result.scalars().first.return_value = self.user
         result = await create_user(body=user, db=self.session)
         self.assertEqual(result.email, user.email)
         self.assertEqual(result.username, user.username)
@@ -43,8 +45,9 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     async def test_update_avatar(self):
         user = User(username= 'Irys Toreno', email= 'eeee0123@meta.com', password='usercst001')
-        self.session.query().filter().first.return_value = user
-        result = await update_avatar(email=user.email, url='http:\\localhost:8000\\user1.jpg', db=self.session)
+        self.result.scalars().first.return_value = user
+        result = await update_avatar(email=user.email, avatar={'64': 'http://localhost:8000/media/avatars/1/64.webp'},
+                                     db=self.session)
         self.assertEqual(result.email, user.email)
         self.assertEqual(result.username, user.username)
         self.assertEqual(result.password, user.password)
@@ -52,18 +55,18 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     async def test_confirmed_email(self):
         user = self.user
-        self.session.query().filter().first.return_value = user
+        self.result.scalars().first.return_value = user
         result = await confirmed_email(email=user.email, db=self.session)
         self.assertEqual(result.email, user.email)
 
     async def test_not_confirmed_email(self):
-        self.session.query().filter().first.return_value = None
+        self.result.scalars().first.return_value = None
         result = await confirmed_email(email='test@ijk.cm', db=self.session)
         self.assertIsNone(result)
 
     async def test_update_token(self):
         user = self.user
-        self.session.query().filter().first.return_value = user
+        self.result.scalars().first.return_value = user
         result = await update_token(user= self.user, token= 'idCIH123154 HLDJcoih123456', db=self.session)
         self.assertEqual(result.email, user.email)
         self.assertIsNotNone(result.refresh_token)
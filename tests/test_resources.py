@@ -0,0 +1,48 @@
+import unittest
+
+from str.services.resources import Resources
+
+
+class TestResources(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.resources = Resources()
+
+    def action(self, name: str):
+        async def run():
+            self.calls.append(name)
+        return run
+
+    def failing(self, name: str):
+        def run():
+            self.calls.append(name)
+            raise ConnectionError("unreachable")
+        return run
+
+    async def test_warm_up_in_order_and_close_in_reverse(self):
+        self.resources.register("database", warm_up=self.action("warm database"), close=self.action("close database"))
+        self.resources.register("jwt", warm_up=lambda: self.calls.append("warm jwt"))
+        self.resources.register("redis", warm_up=self.action("warm redis"), close=self.action("close redis"))
+        timings = await self.resources.start()
+        await self.resources.close()
+        self.assertEqual(self.calls, ["warm database", "warm jwt", "warm redis", "close redis", "close database"])
+        self.assertEqual(list(timings), ["database", "jwt", "redis"])
+
+    async def test_failure_does_not_stop_the_others(self):
+        self.resources.register("redis", warm_up=self.failing("warm redis"), close=self.failing("close redis"))
+        self.resources.register("database", warm_up=self.action("warm database"), close=self.action("close database"))
+        timings = await self.resources.start()
+        await self.resources.close()
+        self.assertEqual(self.calls, ["warm redis", "warm database", "close database", "close redis"])
+        self.assertIsNone(timings["redis"])
+        self.assertIsNotNone(timings["database"])
+
+    async def test_warm_up_disabled(self):
+        self.resources.register("database", warm_up=self.action("warm database"))
+        self.assertEqual(await self.resources.start(warm_up=False), {})
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import unittest
+from datetime import date, datetime
+from typing import List
+
+from pydantic import TypeAdapter
+
+from str.database.models import Contact
+from str.schemas import ContactResponse
+from str.services.serializers import RowSerializer
+
+
+def contact(number: int) -> Contact:
+    return Contact(id=number, first_name="Jon", last_name=f"Snow{number}", email=f"jon{number}@example.com",
+                   phone_number="+380501234567", date_of_birth=datetime(1990, 1, 2), info="Knows nothing",
+                   created_at=datetime(2024, 7, 1, 12, 30), user_id=1)
+
+
+class TestRowSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = RowSerializer(ContactResponse)
+        self.adapter = TypeAdapter(List[ContactResponse])
+
+    def test_list_matches_the_response_model(self):
+        rows = [contact(number) for number in range(3)]
+        expected = self.adapter.dump_python(self.adapter.validate_python(rows, from_attributes=True), mode="json")
+        self.assertEqual(json.loads(self.serializer.dump_list(rows)), expected)
+
+    def test_only_response_fields_are_sent(self):
+        data = json.loads(self.serializer.dump(contact(1)))
+        self.assertEqual(set(data), set(ContactResponse.model_fields))
+        self.assertEqual(data["date_of_birth"], "1990-01-02")
+
+    def test_dates_are_kept(self):
+        row = contact(1)
+        row.date_of_birth = date(1990, 1, 2)
+        self.assertEqual(json.loads(self.serializer.dump(row))["date_of_birth"], "1990-01-02")
+
+    def test_empty_list(self):
+        self.assertEqual(self.serializer.dump_list([]), b"[]")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+from str.repository.notes import birthday_ranges, get_upcoming_birthdays
+
+
+@pytest.mark.parametrize("today, days, ranges", [
+    (date(2024, 7, 15), 7, [(715, 721)]),
+    (date(2024, 12, 28), 7, [(1228, 1231), (101, 103)]),
+    (date(2023, 2, 22), 7, [(222, 229)]),
+    (date(2024, 2, 22), 7, [(222, 228)]),
+    (date(2024, 3, 1), 366, [(101, 1231)]),
+])
+def test_birthday_ranges(today, days, ranges):
+    assert birthday_ranges(today, days) == ranges
+
+
+@pytest.fixture(scope="module")
+def owner(add_user):
+    births = [('Dec', date(1990, 12, 30)), ('Jan', date(1985, 1, 2)), ('Leap', date(2000, 2, 29)),
+              ('Mar', date(1999, 3, 1)), ('Jul', date(2001, 7, 4))]
+    return add_user('birthdays', [{"first_name": name, "last_name": 'Born', "email": f'{name.lower()}@example.com',
+                                   "date_of_birth": born} for name, born in births])
+
+
+def upcoming(run_db, owner, today, days):
+    contacts = run_db(lambda db: get_upcoming_birthdays(0, 100, owner, db, days, today))
+    return [contact.first_name for contact in contacts]
+
+
+def test_window_wraps_the_year(run_db, owner):
+    assert upcoming(run_db, owner, date(2024, 12, 29), 7) == ['Dec', 'Jan']
+
+
+def test_leap_day_in_common_year(run_db, owner):
+    assert upcoming(run_db, owner, date(2023, 2, 27), 2) == ['Leap']
+    assert upcoming(run_db, owner, date(2023, 2, 27), 3) == ['Leap', 'Mar']
+
+
+def test_leap_day_in_leap_year(run_db, owner):
+    assert upcoming(run_db, owner, date(2024, 2, 27), 2) == []
+    assert upcoming(run_db, owner, date(2024, 2, 29), 1) == ['Leap']
+
+
+def test_window_outside_birthdays(run_db, owner):
+    assert upcoming(run_db, owner, date(2024, 8, 1), 30) == []